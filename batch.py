@@ -0,0 +1,264 @@
+"""Vectorized batch simulator: many programs on many maps at once.
+
+N lanes, each one (program, grid) pair, are advanced together one
+micro-step at a time with NumPy. Grids are a stacked (N, H, W) uint8
+array using the engine tile codes; rover position, heading, program
+counter and loop stack are parallel arrays. Outcomes, move counts and
+tick counts match engine.run_to_end, which also runs the last few lanes.
+"""
+import numpy as np
+
+from compiler import (
+    OP_COLLECT, OP_DESTROY, OP_END, OP_LOOP, OP_MOVE, OP_REPEAT, OP_TURN,
+    Program, compile_program,
+)
+from engine import (
+    BLOCKED, GAS_NOT_DESTROYED, NOT_AT_GOAL, NOTHING_TO_COLLECT, NOTHING_TO_DESTROY,
+    OUT_OF_BOUNDS, OUTCOME_MESSAGES, RUNNING, SUCCESS, TICK_LIMIT,
+    TILE_BLOCKED, TILE_GAS, TILE_ITEM, RoverState, decode_grid, encode_grid, run_to_end,
+)
+
+# Per-lane tile states that only exist while a batch is running
+TILE_GAS_DESTROYED = 6
+TILE_ITEM_COLLECTED = 7
+_UNDO_LANE_TILES = bytes.maketrans(bytes([TILE_GAS_DESTROYED, TILE_ITEM_COLLECTED]),
+                                   bytes([TILE_GAS, TILE_ITEM]))
+
+# Below this many live lanes a NumPy tick costs more than plain Python per lane
+TAIL_LANES = 256
+
+# Lane statuses are the engine's outcome codes; SUCCESS is formatted with the move count
+MESSAGES = OUTCOME_MESSAGES
+
+
+class BatchResult:
+    """Per-lane outcome arrays of a batch run."""
+
+    def __init__(self, status, move_count):
+        self.status = status
+        self.move_count = move_count
+        self.success = status == SUCCESS
+
+    def __len__(self):
+        return len(self.status)
+
+    def message(self, lane):
+        """The outcome message for one lane."""
+        return MESSAGES[self.status[lane]].format(self.move_count[lane])
+
+
+# === INPUT HELPERS ===
+def as_grid_array(grids):
+    """Stack grids (uint8 arrays or rows of tile characters) into an (N, H, W) uint8 array."""
+    if isinstance(grids, np.ndarray):
+        return np.array(grids, dtype=np.uint8)
+    out = []
+    for g in grids:
+        if isinstance(g, np.ndarray):
+            out.append(g.astype(np.uint8, copy=False))
+        else:
+            out.append(np.frombuffer(encode_grid(g), np.uint8).reshape(len(g), len(g[0])))
+    return np.stack(out)
+
+
+def stack_programs(programs):
+    """Concatenate Programs into flat ops/args arrays.
+
+    Returns (ops, args, begin, end, depth) where lane i owns
+    ops[begin[i]:end[i]] and depth is the deepest repeat nesting.
+    """
+    compiled = [p if isinstance(p, Program) else compile_program(p) for p in programs]
+    lengths = np.fromiter((len(p) for p in compiled), np.int64, len(compiled))
+    end = np.cumsum(lengths)
+    begin = end - lengths
+    # one trailing OP_END so fetching at a lane's end is always in range
+    ops = np.frombuffer(b"".join(p.ops.tobytes() for p in compiled) + bytes([OP_END]), np.uint8)
+    args = np.concatenate([np.frombuffer(p.args, np.int32) for p in compiled]
+                          + [np.zeros(1, np.int32)]).astype(np.int64)
+    nesting = np.cumsum((ops == OP_REPEAT).astype(np.int64) - (ops == OP_LOOP))
+    depth = int(nesting.max()) if len(nesting) else 0
+    return ops, args, begin, end, depth
+
+
+# === SIMULATION ===
+def run_batch(programs, grids, starts, ends, max_ticks=None):
+    """Run programs[i] on grids[i] from starts[i] and score against ends[i].
+
+    starts and ends are (x, y) pairs. Returns a BatchResult.
+    """
+    grids = as_grid_array(grids)
+    n, h, w = grids.shape
+    if len(programs) != n:
+        raise ValueError("need one program per grid")
+    ops, args, pc, pc_end, depth = stack_programs(programs)
+    pc_begin = pc.copy()
+    starts = np.asarray(starts, np.int64).reshape(n, 2)
+    ends = np.asarray(ends, np.int64).reshape(n, 2)
+
+    x = starts[:, 0].copy()
+    y = starts[:, 1].copy()
+    heading = np.zeros(n, np.int64)
+    remaining = np.zeros(n, np.int64)   # tiles left in the current move
+    moves = np.zeros(n, np.int64)
+    status = np.zeros(n, np.uint8)
+    fault = np.zeros(n, np.uint8)       # first fault of each lane
+    loop_pc = np.zeros((n, max(depth, 1)), np.int64)
+    loop_left = np.zeros((n, max(depth, 1)), np.int64)
+    sp = np.zeros(n, np.int64)
+
+    live = np.arange(n)
+    tick = 0
+    while live.size:
+        _fetch(live[remaining[live] == 0], ops, args, pc, pc_end, loop_pc, loop_left, sp)
+        done = (remaining[live] == 0) & (pc[live] >= pc_end[live])
+        status[live[done]] = NOT_AT_GOAL
+        live = live[~done]
+        if not live.size:
+            break
+        if max_ticks is not None and tick >= max_ticks:
+            status[live] = TICK_LIMIT
+            break
+        if live.size <= TAIL_LANES:
+            _finish(live, ops, args, pc_begin, pc, pc_end, grids, x, y, heading, remaining, moves,
+                    status, fault, loop_pc, loop_left, sp, ends,
+                    None if max_ticks is None else max_ticks - tick)
+            break
+        tick += 1
+        walking = remaining[live] > 0
+        _decode(live[~walking], ops, args, pc, grids, x, y, heading,
+                remaining, status, fault, w, h)
+        _walk(live[walking], grids, x, y, heading, remaining, moves, status, fault, ends, w, h)
+        live = live[status[live] == RUNNING]
+
+    failed = (status == NOT_AT_GOAL) & (fault != 0)
+    status[failed] = fault[failed]
+    return BatchResult(status, moves)
+
+
+def run_matrix(programs, grids, starts, ends, max_ticks=None):
+    """Run every program on every grid; returns a BatchResult with (P, M) arrays."""
+    grids = as_grid_array(grids)
+    p, m = len(programs), len(grids)
+    compiled = [q if isinstance(q, Program) else compile_program(q) for q in programs]
+    lane_programs = [q for q in compiled for _ in range(m)]
+    result = run_batch(lane_programs, np.tile(grids, (p, 1, 1)),
+                       np.tile(np.asarray(starts).reshape(m, 2), (p, 1)),
+                       np.tile(np.asarray(ends).reshape(m, 2), (p, 1)), max_ticks)
+    return BatchResult(result.status.reshape(p, m), result.move_count.reshape(p, m))
+
+
+def _fault(lanes, fault, code):
+    fault[lanes[fault[lanes] == 0]] = code
+
+
+def _fetch(lanes, ops, args, pc, pc_end, loop_pc, loop_left, sp):
+    """Run loop control until every lane's next op is an action or its program is over."""
+    while lanes.size:
+        lanes = lanes[pc[lanes] < pc_end[lanes]]
+        op = ops[pc[lanes]]
+        control = (op == OP_REPEAT) | (op == OP_LOOP)
+        lanes, op = lanes[control], op[control]
+
+        rep = lanes[op == OP_REPEAT]
+        loop_pc[rep, sp[rep]] = pc[rep] + 1
+        loop_left[rep, sp[rep]] = args[pc[rep]]
+        sp[rep] += 1
+        pc[rep] += 1
+
+        loop = lanes[op == OP_LOOP]
+        top = sp[loop] - 1
+        loop_left[loop, top] -= 1
+        again = loop_left[loop, top] > 0
+        pc[loop[again]] = loop_pc[loop[again], top[again]]
+        pc[loop[~again]] += 1
+        sp[loop[~again]] -= 1
+
+
+def _decode(lanes, ops, args, pc, grids, x, y, heading, remaining, status, fault, w, h):
+    """Execute the action at pc for lanes that are not in the middle of a move."""
+    op = ops[pc[lanes]]
+    arg = args[pc[lanes]]
+
+    sel = op == OP_MOVE
+    remaining[lanes[sel]] = np.maximum(arg[sel], 0)
+
+    sel = op == OP_TURN
+    heading[lanes[sel]] = (heading[lanes[sel]] + arg[sel]) % 360
+
+    sel = lanes[op == OP_COLLECT]
+    tile = grids[sel, y[sel], x[sel]]
+    ok = (tile == TILE_ITEM) | (tile == TILE_ITEM_COLLECTED)
+    grids[sel[ok], y[sel[ok]], x[sel[ok]]] = TILE_ITEM_COLLECTED
+    _fault(sel[~ok], fault, NOTHING_TO_COLLECT)
+
+    sel = lanes[op == OP_DESTROY]
+    d = heading[sel]
+    ax = x[sel] + (d == 0) - (d == 180)
+    ay = y[sel] + (d == 90) - (d == 270)
+    inside = (ax >= 0) & (ay >= 0) & (ax < w) & (ay < h)
+    ahead = np.full(sel.size, TILE_BLOCKED, np.uint8)
+    ahead[inside] = grids[sel[inside], ay[inside], ax[inside]]
+    use_ahead = (ahead == TILE_GAS) | (ahead == TILE_GAS_DESTROYED)
+    ax = np.where(use_ahead, ax, x[sel])
+    ay = np.where(use_ahead, ay, y[sel])
+    tile = grids[sel, ay, ax]
+    ok = (tile == TILE_GAS) | (tile == TILE_GAS_DESTROYED)
+    grids[sel[ok], ay[ok], ax[ok]] = TILE_GAS_DESTROYED
+    _fault(sel[~ok], fault, NOTHING_TO_DESTROY)
+
+    status[lanes[op == OP_END]] = NOT_AT_GOAL
+
+    pc[lanes] += 1
+
+
+def _walk(lanes, grids, x, y, heading, remaining, moves, status, fault, ends, w, h):
+    """Advance lanes that are mid-move by one tile; a fault ends the move, not the run."""
+    d = heading[lanes]
+    nx = x[lanes] + (d == 0) - (d == 180)
+    ny = y[lanes] + (d == 90) - (d == 270)
+
+    inside = (nx >= 0) & (ny >= 0) & (nx < w) & (ny < h)
+    out = lanes[~inside]
+    _fault(out, fault, OUT_OF_BOUNDS)
+    remaining[out] = 0
+    lanes, nx, ny = lanes[inside], nx[inside], ny[inside]
+
+    tile = grids[lanes, ny, nx]
+    for code, stop in ((BLOCKED, tile == TILE_BLOCKED), (GAS_NOT_DESTROYED, tile == TILE_GAS)):
+        _fault(lanes[stop], fault, code)
+        remaining[lanes[stop]] = 0
+
+    ok = (tile != TILE_BLOCKED) & (tile != TILE_GAS)
+    lanes, nx, ny = lanes[ok], nx[ok], ny[ok]
+    x[lanes] = nx
+    y[lanes] = ny
+    remaining[lanes] -= 1
+    moves[lanes] += 1
+    status[lanes[(nx == ends[lanes, 0]) & (ny == ends[lanes, 1])]] = SUCCESS
+
+
+def _finish(lanes, ops, args, pc_begin, pc, pc_end, grids, x, y, heading, remaining, moves,
+            status, fault, loop_pc, loop_left, sp, ends, ticks_left):
+    """Hand the last few live lanes to engine.run_to_end, each resumed where it stands."""
+    _, h, w = grids.shape
+    for lane in lanes.tolist():
+        begin, end = int(pc_begin[lane]), int(pc_end[lane])
+        tiles = grids[lane]
+        state = RoverState(w, h, (int(x[lane]), int(y[lane])), int(heading[lane]))
+        state.program = Program()
+        state.program.ops.frombytes(ops[begin:end].tobytes())
+        state.program.args.frombytes(args[begin:end].astype(np.int32).tobytes())
+        left = int(remaining[lane])
+        # The batch steps past a move when it starts, the engine when it ends
+        state.pc = int(pc[lane]) - begin - (1 if left else 0)
+        state.move_remaining = left
+        state.loop_stack = [(int(loop_pc[lane, k]) - begin, int(loop_left[lane, k]))
+                            for k in range(sp[lane])]
+        state.destroyed = sum(1 << i for i in
+                              np.flatnonzero(tiles.ravel() == TILE_GAS_DESTROYED).tolist())
+        grid = decode_grid(tiles.tobytes().translate(_UNDO_LANE_TILES), w)
+        outcome, moved = run_to_end(grid, state, tuple(ends[lane].tolist()), ticks_left)
+        moves[lane] += moved
+        if outcome not in (SUCCESS, TICK_LIMIT) and fault[lane]:
+            outcome = fault[lane]
+        status[lane] = outcome
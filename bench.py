@@ -0,0 +1,284 @@
+"""Benchmarks for the hot paths, with fixed seeds and JSON baselines.
+
+Each benchmark is looped until a run lasts MIN_TIME, timed `--repeat`
+times, and the best run is kept as time per operation. Save a baseline on one machine and compare later
+runs on the same machine against it:
+
+    python bench.py --save bench_baseline.json
+    python bench.py --compare bench_baseline.json     # exit 1 on regressions
+    python bench.py --only parse --repeat 10
+
+draw_grid is rendered with SDL's dummy video driver, so no window opens;
+it is skipped when pygame is not installed.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import engine
+from batch import run_batch
+from compiler import compile_source
+from solver import solve
+from swarm import Swarm, spawn_points
+
+SEED = 1234
+TOLERANCE = 0.20   # slower by more than this fraction counts as a regression
+MIN_TIME = 0.05    # seconds each timed run lasts at least (short runs are looped)
+
+BENCHMARKS = []    # (name, setup); setup() -> (run, ops per run)
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+
+def _random_lines(rng, count):
+    lines = []
+    for _ in range(count):
+        r = rng.random()
+        if r < 0.4:
+            lines.append(f"move({rng.randint(1, 9)});")
+        elif r < 0.7:
+            lines.append(f"turn({rng.choice((90, 180, 270))});")
+        elif r < 0.85:
+            lines.append("collect;")
+        else:
+            lines.append("destroy;")
+    return lines
+
+
+def _solved_maps(count, size=engine.GRID_SIZE):
+    """(grid, start, end, solution lines) for the first solvable seeds."""
+    out = []
+    seed = SEED
+    while len(out) < count:
+        grid, start, end = engine.generate_grid(seed, size)
+        solution = solve(grid, start, end)
+        if solution is not None:
+            out.append((grid, start, end, solution.program))
+        seed += 1
+    return out
+
+
+# === PARSING ===
+@benchmark("parse_large")
+def _parse_large():
+    lines = _random_lines(random.Random(SEED), 5000)
+    return lambda: engine.parse_code(lines), len(lines)
+
+
+@benchmark("parse_nested")
+def _parse_nested():
+    rng = random.Random(SEED)
+    lines = []
+    for _ in range(200):
+        depth = rng.randint(1, 12)
+        body = " ".join(_random_lines(rng, 3))
+        lines.append("repeat(3){ " * depth + body + " }" * depth)
+    return lambda: engine.parse_code(lines), len(lines)
+
+
+# === EXECUTION ===
+@benchmark("step_execution")
+def _step_execution():
+    grid, start, _, program = _solved_maps(1)[0]
+    code = engine.parse_code(program)
+    steps = []
+
+    def run():
+        state = engine.RoverState.for_grid(grid, start)
+        state.queue(code)
+        n = 0
+        while state.pending():
+            engine.step_execution(grid, state)
+            n += 1
+        steps.append(n)
+
+    run()
+    return run, steps[0]
+
+
+@benchmark("run_code")
+def _run_code():
+    maps = [(grid, start, end, compile_source("\n".join(program)))
+            for grid, start, end, program in _solved_maps(100)]
+    return lambda: [engine.run_code(g, s, e, p) for g, s, e, p in maps], len(maps)
+
+
+@benchmark("run_code_long_moves")
+def _run_code_long_moves():
+    size = 1000
+    grid = [["."] * size for _ in range(size)]
+    grid[0][0], grid[-1][-1] = "S", "E"
+    code = compile_source(f"repeat(10){{ move({size - 1}); turn(90); move({size - 1}); turn(90);"
+                          f" move({size - 1}); turn(90); move({size - 1}); turn(90); }}")
+    return lambda: engine.run_code(grid, (0, 0), (size - 1, size - 1), code), 1
+
+
+@benchmark("run_batch")
+def _run_batch():
+    rng = random.Random(SEED)
+    maps = [engine.generate_grid(SEED + i) for i in range(1000)]
+    programs = [compile_source("\n".join(_random_lines(rng, 30))) for _ in maps]
+    grids = [g for g, _, _ in maps]
+    starts = [s for _, s, _ in maps]
+    ends = [e for _, _, e in maps]
+    return lambda: run_batch(programs, grids, starts, ends), len(maps)
+
+
+@benchmark("swarm_tick")
+def _swarm_tick():
+    rng = random.Random(SEED)
+    grid, start, end = engine.generate_grid(SEED, 256)
+    starts = spawn_points(grid, start, 300)
+    programs = [compile_source("\n".join(_random_lines(rng, 30))) for _ in starts]
+
+    def run():
+        swarm = Swarm(grid, starts, end)
+        for i, program in enumerate(programs):
+            swarm.queue(i, program)
+        for _ in range(50):
+            swarm.tick()
+
+    return run, 50 * len(starts)
+
+
+@benchmark("solve")
+def _solve():
+    maps = [engine.generate_grid(SEED + i) for i in range(20)]
+    return lambda: [solve(g, s, e) for g, s, e in maps], len(maps)
+
+
+# === GRID GENERATION ===
+def _generate(size, count):
+    return lambda: [engine.generate_grid(SEED + i, size) for i in range(count)], count
+
+
+for _size, _count in ((14, 200), (64, 20), (256, 2)):
+    benchmark(f"generate_grid_{_size}")(lambda size=_size, count=_count: _generate(size, count))
+
+
+# === RENDERING ===
+def _game():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    try:
+        import pygame  # noqa: F401
+    except ImportError:
+        return None
+    import test as game
+    return game
+
+
+def _draw_setup(kind):
+    game = _game()
+    if game is None:
+        return None
+    grid, start, _ = engine.generate_grid(SEED)
+    code = ["move(1);"] * 30
+    state = engine.RoverState.for_grid(grid, start)
+
+    def frame():
+        game.draw_grid(grid, state, code, "mo", "Queued.", 0, 0, 0)
+
+    def full():
+        game.invalidate_frame()
+        frame()
+
+    def moving():
+        # alternate between two tiles so every frame has something to repaint
+        state.pos = (1, 0) if state.pos == start else start
+        frame()
+
+    frame()
+    return {"full": full, "idle": frame, "moving": moving}[kind], 1
+
+
+for _kind in ("full", "idle", "moving"):
+    benchmark(f"draw_grid_{_kind}")(lambda kind=_kind: _draw_setup(kind))
+
+
+# === RUNNER ===
+def _timed(run, loops):
+    began = time.perf_counter()
+    for _ in range(loops):
+        run()
+    return time.perf_counter() - began
+
+
+def run_benchmarks(only=None, repeat=5):
+    """{name: {"seconds": best run, "ops": ops per run, "us_per_op": ...}}."""
+    results = {}
+    for name, setup in BENCHMARKS:
+        if only and only not in name:
+            continue
+        prepared = setup()
+        if prepared is None:
+            print(f"{name:24} skipped (pygame not installed)")
+            continue
+        run, ops = prepared
+        loops = 1
+        while _timed(run, loops) < MIN_TIME:
+            loops *= 2
+        best = min(_timed(run, loops) for _ in range(repeat)) / loops
+        results[name] = {"seconds": best, "ops": ops, "us_per_op": best / ops * 1e6}
+        print(f"{name:24} {best / ops * 1e6:12.2f} us/op  ({ops} ops x {loops}, best of {repeat})")
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Print per-benchmark ratios to the baseline; returns the names that regressed."""
+    slower = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:24} new")
+            continue
+        ratio = result["us_per_op"] / old["us_per_op"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  SLOWER"
+            slower.append(name)
+        elif ratio < 1 - tolerance:
+            flag = "  faster"
+        print(f"{name:24} {old['us_per_op']:12.2f} -> {result['us_per_op']:12.2f} us/op"
+              f"  x{ratio:.2f}{flag}")
+    return slower
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the rover engine and renderer")
+    parser.add_argument("--only", help="run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark (best is kept)")
+    parser.add_argument("--save", metavar="FILE", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed slowdown before a benchmark counts as regressed")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmarks(args.only, args.repeat)
+    if args.save:
+        meta = {"python": platform.python_version(), "machine": platform.machine(),
+                "platform": platform.platform(), "seed": SEED, "repeat": args.repeat}
+        with open(args.save, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
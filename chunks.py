@@ -0,0 +1,99 @@
+"""Chunked storage for very large maps (500x500 and up).
+
+A ChunkedGrid keeps tiles in CHUNK x CHUNK blocks that are generated the
+first time something looks at them, so memory follows the part of the map
+that has actually been viewed or driven over. Each chunk has its own
+seeded generator, so chunks come out the same whatever order they are
+touched in. The guaranteed S-to-E path is laid out up front, which costs
+about two entries per row of the map.
+
+grid[y][x] works as it does for the nested lists from generate_grid, so
+the engine and the renderer can use either kind of grid.
+"""
+import random
+
+CHUNK = 64           # tiles per chunk side
+BLOCKED_ODDS = 0.45  # as in engine.generate_grid
+_BLOCKED, _EMPTY = ord("X"), ord(".")
+
+
+class _Row:
+    __slots__ = ("grid", "y")
+
+    def __init__(self, grid, y):
+        self.grid = grid
+        self.y = y
+
+    def __len__(self):
+        return self.grid.size
+
+    def __getitem__(self, x):
+        if not 0 <= x < self.grid.size:
+            raise IndexError(x)
+        return self.grid.tile(x, self.y)
+
+
+class ChunkedGrid:
+    """Square map of tile characters, generated chunk by chunk on demand."""
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.seed = random.randrange(1 << 32) if seed is None else seed
+        self.chunks = {}       # (cx, cy) -> bytearray of CHUNK*CHUNK tile chars
+        self.path = {}         # (cx, cy) -> [(x, y, tile)] on the guaranteed path
+        self._lay_path()
+
+    def _lay_path(self):
+        rng = random.Random(f"{self.seed}/path")
+        last = self.size - 1
+        x = y = 0
+        cells = []
+        while (x, y) != (last, last):
+            if x < last and y < last:
+                if rng.random() < 0.5:
+                    x += 1
+                else:
+                    y += 1
+            elif x < last:
+                x += 1
+            else:
+                y += 1
+            cells.append((x, y))
+        # Place challenges on path
+        for x, y in cells[:-1]:
+            tile = rng.choices([".", "G", "I"], weights=[0.3, 0.5, 0.2])[0]
+            self.path.setdefault((x // CHUNK, y // CHUNK), []).append((x, y, tile))
+        self.path.setdefault((0, 0), []).append((0, 0, "S"))
+        self.path.setdefault((last // CHUNK, last // CHUNK), []).append((last, last, "E"))
+
+    def _chunk(self, cx, cy):
+        rng = random.Random(f"{self.seed}/{cx}/{cy}")
+        data = bytearray(_BLOCKED if rng.random() < BLOCKED_ODDS else _EMPTY
+                         for _ in range(CHUNK * CHUNK))
+        for x, y, tile in self.path.get((cx, cy), ()):
+            data[(y % CHUNK) * CHUNK + x % CHUNK] = ord(tile)
+        self.chunks[cx, cy] = data
+        return data
+
+    def tile(self, x, y):
+        key = (x // CHUNK, y // CHUNK)
+        data = self.chunks.get(key)
+        if data is None:
+            data = self._chunk(*key)
+        return chr(data[(y % CHUNK) * CHUNK + x % CHUNK])
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, y):
+        if not 0 <= y < self.size:
+            raise IndexError(y)
+        return _Row(self, y)
+
+    def __iter__(self):
+        return (_Row(self, y) for y in range(self.size))
+
+
+def generate_chunked_grid(size, seed=None):
+    """Like engine.generate_grid, but returns a lazily generated ChunkedGrid."""
+    return ChunkedGrid(size, seed), (0, 0), (size - 1, size - 1)
@@ -0,0 +1,462 @@
+"""Compile rover programs into a compact, array-backed instruction stream.
+
+A compiled Program is two parallel arrays: a one-byte opcode and a 32-bit
+integer argument per instruction. repeat(k){ ... } blocks are kept as a
+REPEAT/LOOP pair around the body instead of being copied k times, so the
+size of a program does not depend on its repeat counts.
+
+Source text goes through a single-pass tokenizer and a streaming parser
+that yields instructions as it goes; syntax errors carry line and column.
+"""
+import re
+from array import array
+
+# === OPCODES ===
+OP_MOVE = 0      # arg: number of tiles
+OP_TURN = 1      # arg: angle in degrees
+OP_COLLECT = 2
+OP_DESTROY = 3
+OP_END = 4
+OP_REPEAT = 5    # arg: iteration count (always >= 1)
+OP_LOOP = 6      # closes the innermost REPEAT
+
+OP_NAMES = ("move", "turn", "collect", "destroy", "end", "repeat", "loop")
+MAX_ARG = 2 ** 31 - 1   # largest argument an instruction can hold (args is array("i"))
+
+
+class Program:
+    """Instruction stream of (opcode, argument) pairs stored in typed arrays."""
+    __slots__ = ("ops", "args")
+
+    def __init__(self):
+        self.ops = array("B")
+        self.args = array("i")
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __iter__(self):
+        return zip(self.ops, self.args)
+
+    def emit(self, op, arg=0):
+        self.ops.append(op)
+        try:
+            self.args.append(arg)
+        except OverflowError:
+            self.ops.pop()
+            raise ValueError(f"{OP_NAMES[op]} argument {arg} is too large")
+
+    def extend(self, other):
+        self.ops.extend(other.ops)
+        self.args.extend(other.args)
+
+    def clear(self):
+        del self.ops[:]
+        del self.args[:]
+
+
+class ParseError(ValueError):
+    """Syntax error in a rover program, with the 1-based line and column."""
+
+    def __init__(self, message, line, col):
+        super().__init__(f"line {line}, col {col}: {message}")
+        self.line = line
+        self.col = col
+
+
+# === TOKENIZER ===
+_TOKEN_RE = re.compile(r"""
+    (?P<newline>\n)
+  | (?P<space>[ \t\r\f\v]+)
+  | (?P<number>-?\d+)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<punct>[(){};.])
+  | (?P<bad>.)
+""", re.VERBOSE)
+
+
+def line_col(src, offset):
+    """1-based (line, column) of a character offset in src."""
+    line_start = src.rfind("\n", 0, offset) + 1
+    return src.count("\n", 0, offset) + 1, offset - line_start + 1
+
+
+def tokenize(src):
+    """Yield (kind, text, offset) tokens in one pass; kind 'eof' comes last.
+
+    Punctuation tokens use the character itself as their kind.
+    """
+    for m in _TOKEN_RE.finditer(src):
+        kind = m.lastgroup
+        if kind == "space":
+            continue
+        if kind == "bad":
+            line, col = line_col(src, m.start())
+            raise ParseError(f"Unexpected character {m.group()!r}", line, col)
+        text = m.group()
+        yield (text if kind == "punct" else kind), text, m.start()
+    yield "eof", "", len(src)
+
+
+# === PARSER ===
+_SIMPLE = {"collect": OP_COLLECT, "destroy": OP_DESTROY}
+_WITH_ARG = {"move": OP_MOVE, "turn": OP_TURN}
+
+
+def parse(src):
+    """Parse source text and lazily yield (opcode, argument) instructions.
+
+    repeat blocks nest to any depth. Their REPEAT is only emitted once the
+    body produces an instruction, so repeat(0) and empty bodies vanish.
+    """
+    tokens = tokenize(src)
+    tok = next(tokens)
+
+    def error(message, offset):
+        line, col = line_col(src, offset)
+        return ParseError(message, line, col)
+
+    # Open repeat blocks: [count, offset]. The first `opened` have had
+    # their REPEAT emitted; `muted` counts open blocks with a zero count.
+    blocks = []
+    opened = 0
+    muted = 0
+
+    def expect(kind, message):
+        nonlocal tok
+        if tok[0] != kind:
+            raise error(message, tok[2])
+        text = tok[1]
+        tok = next(tokens)
+        return text
+
+    def number(what):
+        text = expect("number", f"{what} requires a number")
+        return int(text)
+
+    while True:
+        kind, text, offset = tok
+        if kind == "eof":
+            break
+        if kind in ("newline", ";"):
+            tok = next(tokens)
+            continue
+
+        if kind == "}":
+            if not blocks:
+                raise error("Unexpected }", offset)
+            tok = next(tokens)
+            if blocks.pop()[0] == 0:
+                muted -= 1
+            if len(blocks) < opened:
+                opened -= 1
+                yield OP_LOOP, 0
+            continue
+
+        if kind != "name":
+            raise error(f"Unexpected {text!r}", offset)
+        word = text.lower()
+        tok = next(tokens)
+
+        if word == "repeat":
+            expect("(", "Expected ( after repeat")
+            k = number("repeat(count)")
+            if k < 0:
+                raise error("repeat count cannot be negative", offset)
+            expect(")", "Expected ) after repeat(count)")
+            while tok[0] == "newline":
+                tok = next(tokens)
+            expect("{", "Expected { after repeat(count)")
+            blocks.append([k, offset])
+            if k == 0:
+                muted += 1
+            continue
+
+        if word in _WITH_ARG:
+            expect("(", f"Expected ( after {word}")
+            op, arg = _WITH_ARG[word], number(f"{word}(n)")
+            expect(")", f"Expected ) after {word}(n)")
+        elif word in _SIMPLE:
+            op, arg = _SIMPLE[word], 0
+        elif word == "end":
+            op, arg = OP_END, 0
+        else:
+            raise error(f"Unknown instruction '{text}'", offset)
+
+        if op == OP_END and tok[0] == ".":
+            tok = next(tokens)  # "end." terminates itself
+        elif tok[0] not in (";", "newline", "}", "eof"):
+            raise error(f"Expected ; after {word}", tok[2])
+
+        if not muted:
+            while opened < len(blocks):
+                yield OP_REPEAT, blocks[opened][0]
+                opened += 1
+            yield op, arg
+
+    if blocks:
+        raise error("repeat block is missing its closing }", blocks[-1][1])
+
+
+# === COMPILER ===
+# compile_source matches whole statements with one regex each and writes
+# them straight into the Program arrays. Anything it does not recognise
+# (including every syntax error) falls back to parse(), which produces
+# the same instructions, or the ParseError with its position.
+_SP = r"[ \t\r\f\v]*"
+_DONE = rf"(?={_SP}(?:[;\n}}]|$))"   # what parse() accepts after a statement
+_STATEMENT_RE = re.compile(rf"""
+    [ \t\r\f\v\n;]*
+    (?:
+        (?P<word>move|turn)(?!\w){_SP}\({_SP}(?P<arg>-?\d+){_SP}\){_DONE}
+      | (?P<simple>collect|destroy)(?!\w){_DONE}
+      | (?P<end>end)(?!\w)(?:{_SP}\.|{_DONE})
+      | repeat(?!\w){_SP}\({_SP}(?P<count>\d+){_SP}\)[ \t\r\f\v\n]*\{{
+      | (?P<close>}})
+    )
+""", re.VERBOSE | re.IGNORECASE)
+_SEPARATORS_RE = re.compile(r"[ \t\r\f\v\n;]*")
+
+
+class _Fallback(Exception):
+    """compile_source met text it leaves to parse()."""
+
+
+def compile_source(src):
+    """Compile source text into a Program."""
+    try:
+        return _compile_fast(src)
+    except _Fallback:
+        return _compile_parsed(src)
+
+
+def _compile_parsed(src):
+    """compile_source through parse(): the reference the fast path must match."""
+    program = Program()
+    ops, args = program.ops, program.args
+    for op, arg in parse(src):
+        ops.append(op)
+        try:
+            args.append(arg)
+        except OverflowError:
+            raise ValueError(f"{OP_NAMES[op]} argument {arg} is too large")
+    return program
+
+
+def _compile_fast(src):
+    """compile_source for well-formed text; raises _Fallback for anything else."""
+    program = Program()
+    ops, args = program.ops, program.args
+    match = _STATEMENT_RE.match
+    blocks = []    # counts of the open repeat blocks, as in parse()
+    opened = 0
+    muted = 0
+    pos = 0
+    while True:
+        m = match(src, pos)
+        if m is None:
+            break
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "count":
+            count = int(m.group("count"))
+            if count > MAX_ARG:
+                raise _Fallback
+            blocks.append(count)
+            if count == 0:
+                muted += 1
+            continue
+        if kind == "close":
+            if not blocks:
+                raise _Fallback
+            if blocks.pop() == 0:
+                muted -= 1
+            if len(blocks) < opened:
+                opened -= 1
+                ops.append(OP_LOOP)
+                args.append(0)
+            continue
+        if muted:
+            continue
+        while opened < len(blocks):
+            ops.append(OP_REPEAT)
+            args.append(blocks[opened])
+            opened += 1
+        if kind == "arg":
+            ops.append(OP_MOVE if m.group("word").lower() == "move" else OP_TURN)
+            try:
+                args.append(int(m.group("arg")))
+            except OverflowError:
+                raise _Fallback   # parse() reports it
+        else:
+            ops.append(OP_END if kind == "end" else _SIMPLE[m.group("simple").lower()])
+            args.append(0)
+    if blocks or _SEPARATORS_RE.match(src, pos).end() != len(src):
+        raise _Fallback
+    return program
+
+
+def compile_program(lines):
+    """Compile code lines into a Program. Supports nested repeat(k){ ... } blocks."""
+    return compile_source("\n".join(lines))
+
+
+# === INCREMENTAL PARSING ===
+class LineParser:
+    """Parse REPL input a line, or a pasted block of lines, at a time.
+
+    Text is held back while a repeat block is open (or a repeat(k) header
+    still waits for its {); everything up to the last point where all
+    blocks are closed (a top-level ; } or . or the end of a line) is
+    compiled in one parse() pass, so move(1); repeat(3){ queues the move
+    straight away. Error positions count from the start of the statement
+    that failed.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.pending = []     # text of the unfinished statement
+        self.depth = 0        # open repeat blocks in pending
+        self.tail = ()        # last tokens, to spot a repeat(k) without its {
+
+    def is_open(self):
+        """True while buffered text waits for more lines."""
+        return bool(self.pending)
+
+    def feed(self, text):
+        """Add text (one or more lines) and return a Program of the completed statements.
+
+        Raises ParseError (or ValueError) for a bad statement and drops it.
+        """
+        if not text.endswith("\n"):
+            text += "\n"
+        depth, tail = self.depth, self.tail
+        cut = 0   # offset in text after the last complete statement
+        for m in _TOKEN_RE.finditer(text):
+            kind = m.lastgroup
+            if kind == "space":
+                continue
+            if kind == "newline":
+                if depth == 0 and tail[-4:] != ("repeat", "(", "number", ")"):
+                    cut = m.end()
+                continue
+            token = m.group()
+            if token == "{":
+                depth += 1
+            elif token == "}":
+                depth = max(0, depth - 1)   # a stray } is reported by the parser
+            if depth == 0 and token in ";}.":
+                cut = m.end()
+            if kind == "name":
+                token = token.lower()
+            elif kind == "number":
+                token = kind
+            tail = (tail + (token,))[-4:]
+        self.depth, self.tail = depth, tail
+        if not cut:
+            self.pending.append(text)
+            return Program()
+        self.pending.append(text[:cut])
+        src = "".join(self.pending)
+        self.pending = [text[cut:]] if cut < len(text) else []
+        try:
+            return compile_source(src)
+        except ValueError:
+            self.reset()
+            raise
+
+
+# === OPTIMIZER ===
+# For run-to-completion use (run_to_end, batch runs, grading): the result
+# runs fewer instructions but ends the same way, with the same moves.
+# Step mode should keep the original program, one step per instruction.
+
+
+def optimize(program):
+    """Peephole pass: merge adjacent moves and turns, drop no-ops and code after end.
+
+    Loops whose body folds into one move or turn become that move or turn,
+    loops with nothing left in them disappear and repeat(1) is unrolled.
+    """
+    ops, args = list(program.ops), list(program.args)
+    if OP_END in ops:
+        cut = ops.index(OP_END) + 1   # the first end. reached stops everything
+        ops, args = ops[:cut], args[:cut]
+    items, _ = _block(ops, args, 0)
+    out = Program()
+    _emit(_simplify(items), out)
+    return out
+
+
+def _block(ops, args, i):
+    """Instructions from i up to the LOOP closing this block, nesting repeats as lists."""
+    items = []
+    while i < len(ops):
+        op = ops[i]
+        if op == OP_LOOP:
+            return items, i + 1
+        if op == OP_REPEAT:
+            body, end = _block(ops, args, i + 1)
+            items.append((OP_REPEAT, args[i], body))
+            i = end
+        else:
+            items.append((op, args[i]))
+            i += 1
+    return items, i
+
+
+def _push(out, op, arg):
+    """Append an instruction, folding it into the one before where possible."""
+    if op == OP_MOVE and arg <= 0:
+        return
+    if op == OP_TURN:
+        arg %= 360
+        if arg == 0:
+            return
+    if out and out[-1][0] == op:
+        if op == OP_TURN:
+            arg = (out[-1][1] + arg) % 360
+            out.pop()
+            if arg:
+                out.append((op, arg))
+            return
+        if op == OP_MOVE and out[-1][1] + arg <= MAX_ARG:
+            out[-1] = (op, out[-1][1] + arg)
+            return
+    out.append((op, arg))
+
+
+def _simplify(items):
+    out = []
+    for item in items:
+        if item[0] != OP_REPEAT:
+            _push(out, *item)
+            continue
+        count, body = item[1], _simplify(item[2])
+        if not body:
+            continue
+        if count == 1:
+            for inner in body:
+                if inner[0] == OP_REPEAT:
+                    out.append(inner)
+                else:
+                    _push(out, *inner)
+        elif len(body) == 1 and body[0][0] == OP_TURN:
+            _push(out, OP_TURN, body[0][1] * count % 360)
+        elif len(body) == 1 and body[0][0] == OP_MOVE and body[0][1] * count <= MAX_ARG:
+            _push(out, OP_MOVE, body[0][1] * count)
+        else:
+            out.append((OP_REPEAT, count, body))
+    return out
+
+
+def _emit(items, out):
+    for item in items:
+        if item[0] == OP_REPEAT:
+            out.emit(OP_REPEAT, item[1])
+            _emit(item[2], out)
+            out.emit(OP_LOOP)
+        else:
+            out.emit(*item)
@@ -0,0 +1,520 @@
+"""Headless rover rules: grid generation, parsing and execution.
+
+Nothing here imports pygame, so the rules can be used from worker processes
+and scripts without opening a window. test.py is the pygame front-end on top.
+"""
+import random
+import sys
+
+from compiler import (
+    OP_COLLECT, OP_DESTROY, OP_LOOP, OP_MOVE, OP_REPEAT, OP_TURN,
+    Program, compile_program,
+)
+from runindex import STEPS, RunIndex
+
+# === GAME SETTINGS ===
+GRID_SIZE = 14   # default grid size; the rules use each grid's own size
+INDEXED_MOVE_MIN = 16  # shorter moves are checked tile by tile
+
+# === TILE CODES ===
+# One byte per tile for array-backed grids (batch runs, bulk generation).
+TILE_EMPTY, TILE_START, TILE_END, TILE_BLOCKED, TILE_GAS, TILE_ITEM = range(6)
+TILE_CHARS = ".SEXGI"
+_ENCODE_TABLE = bytes.maketrans(TILE_CHARS.encode("ascii"), bytes(range(len(TILE_CHARS))))
+_DECODE_TABLE = bytes.maketrans(bytes(range(len(TILE_CHARS))), TILE_CHARS.encode("ascii"))
+
+def encode_grid(grid):
+    """Pack a grid of tile characters into bytes, row by row."""
+    return "".join(map("".join, grid)).encode("ascii").translate(_ENCODE_TABLE)
+
+def decode_grid(data, width):
+    """Inverse of encode_grid: bytes back to a list of rows of tile characters."""
+    text = bytes(data).translate(_DECODE_TABLE).decode("ascii")
+    return [list(text[i:i + width]) for i in range(0, len(text), width)]
+
+# === EXECUTION / PARSING STATE (REPL) ===
+class RoverState:
+    """Everything one REPL simulation tracks: queue, position and progress.
+
+    Destroyed gas and collected items are integer bitsets with bit
+    y * width + x per tile. Visited tiles are a bytearray bitset plus the
+    trail list that keeps their order; with track_visits=False both stay
+    empty (step such states with trace=False). The queued Program is never
+    changed in place (queue() builds a new one), so copy() shares it. The
+    loop stack is pushed and popped as repeats run, so copy() gives each
+    state its own, along with the visited bits and the trail.
+    """
+    __slots__ = ("width", "height", "program", "pc", "loop_stack", "move_remaining",
+                 "pos", "direction", "destroyed", "collected", "visited", "trail")
+
+    def __init__(self, width=GRID_SIZE, height=None, start=(0, 0), direction=0, track_visits=True):
+        self.width = width
+        self.height = width if height is None else height
+        self.program = Program()   # compiled instructions queued from the REPL
+        self.pc = 0                # index of the next instruction in program
+        self.loop_stack = []       # (body_start, iterations_left) per entered repeat
+        self.move_remaining = 0
+        self.pos = start
+        self.direction = direction  # 0 = right, 90 = down, 180 = left, 270 = up
+        self.destroyed = 0
+        self.collected = 0
+        self.visited = bytearray((self.width * self.height + 7) >> 3 if track_visits else 0)
+        self.trail = []
+        if track_visits:
+            self.visit(start)
+
+    @classmethod
+    def for_grid(cls, grid, start, direction=0, track_visits=True):
+        """Fresh state sized for grid, with the rover on start."""
+        return cls(len(grid[0]), len(grid), start, direction, track_visits)
+
+    def copy(self):
+        other = RoverState.__new__(RoverState)
+        other.width, other.height = self.width, self.height
+        other.program, other.pc = self.program, self.pc
+        other.loop_stack = list(self.loop_stack)
+        other.move_remaining = self.move_remaining
+        other.pos, other.direction = self.pos, self.direction
+        other.destroyed, other.collected = self.destroyed, self.collected
+        other.visited = bytearray(self.visited)
+        other.trail = list(self.trail)
+        return other
+
+    def snapshot(self):
+        """Immutable copy of the state, for undo stacks and hashing."""
+        return (self.width, self.height, self.program, self.pc, tuple(self.loop_stack),
+                self.move_remaining, self.pos, self.direction, self.destroyed,
+                self.collected, bytes(self.visited), tuple(self.trail))
+
+    @classmethod
+    def from_snapshot(cls, snap):
+        state = cls.__new__(cls)
+        (state.width, state.height, state.program, state.pc, loops, state.move_remaining,
+         state.pos, state.direction, state.destroyed, state.collected, visited, trail) = snap
+        state.loop_stack = list(loops)
+        state.visited = bytearray(visited)
+        state.trail = list(trail)
+        return state
+
+    # --- progress bitsets ---
+    def bit(self, pos):
+        return 1 << (pos[1] * self.width + pos[0])
+
+    def is_destroyed(self, pos):
+        return self.destroyed >> (pos[1] * self.width + pos[0]) & 1 == 1
+
+    def is_collected(self, pos):
+        return self.collected >> (pos[1] * self.width + pos[0]) & 1 == 1
+
+    def has_visited(self, pos):
+        i = pos[1] * self.width + pos[0]
+        return self.visited[i >> 3] >> (i & 7) & 1 == 1
+
+    def visit(self, pos):
+        i = pos[1] * self.width + pos[0]
+        if not self.visited[i >> 3] >> (i & 7) & 1:
+            self.visited[i >> 3] |= 1 << (i & 7)
+            self.trail.append(pos)
+
+    # --- instruction queue ---
+    def clear_queue(self):
+        self.program = Program()
+        self.loop_stack = []
+        self.pc = 0
+
+    def queue(self, program):
+        """Append a compiled Program to the queue."""
+        queued = Program()
+        if self.pc < len(self.program) or self.loop_stack:
+            queued.extend(self.program)
+        else:
+            self.pc = 0   # everything queued so far has run; start afresh
+        queued.extend(program)
+        self.program = queued
+
+    def pending(self):
+        """True while queued instructions are left to run.
+
+        Runs any loop control ahead (as fetch does, advancing pc and the
+        loop stack), so a finished repeat at the end of the queue does not
+        count as work left.
+        """
+        return self.pc < len(self.program) and self.fetch()[0] is not None
+
+    def next_op(self):
+        """Opcode the next step_execution call will work on, or None when idle.
+
+        Like fetch(), runs loop control ahead, advancing pc and the loop stack.
+        """
+        return self.fetch()[0]
+
+    def fetch(self):
+        """Run loop control ops and return (op, arg) of the next action, or (None, 0)."""
+        ops, args = self.program.ops, self.program.args
+        pc = self.pc
+        while pc < len(ops):
+            op = ops[pc]
+            if op == OP_REPEAT:
+                self.loop_stack.append((pc + 1, args[pc]))
+                pc += 1
+            elif op == OP_LOOP:
+                body, left = self.loop_stack.pop()
+                if left > 1:
+                    self.loop_stack.append((body, left - 1))
+                    pc = body
+                else:
+                    pc += 1
+            else:
+                self.pc = pc
+                return op, args[pc]
+        self.pc = pc
+        return None, 0
+
+# === GRID GENERATION ===
+def generate_grid(seed=None, size=GRID_SIZE):
+    """Random map with a guaranteed monotone path from S to E.
+
+    The same seed always gives the same map; seed=None draws a fresh one.
+    """
+    rng = random.Random(seed)
+    grid = [["." for _ in range(size)] for _ in range(size)]
+    start = (0, 0)
+    end = (size-1, size-1)
+    grid[start[1]][start[0]] = "S"
+    grid[end[1]][end[0]] = "E"
+
+    # Create a guaranteed path
+    path = [start]
+    x, y = start
+    while (x, y) != end:
+        if x < size - 1 and y < size - 1:
+            if rng.random() < 0.5:
+                x += 1
+            else:
+                y += 1
+        elif x < size - 1:
+            x += 1
+        elif y < size - 1:
+            y += 1
+        path.append((x, y))
+
+    # Place challenges on path
+    for px, py in path[1:-1]:
+        choice = rng.choices(
+            [".", "G", "I"],
+            weights=[0.3, 0.5, 0.2]  # more toxic gas
+        )[0]
+        grid[py][px] = choice
+
+    # Fill rest with blocked tiles randomly
+    on_path = set(path)
+    for j in range(size):
+        row = grid[j]
+        for i in range(size):
+            if row[i] == "." and (i, j) not in on_path:
+                if rng.random() < 0.45:
+                    row[i] = "X"
+
+    return grid, start, end
+
+# === Rover helpers ===
+def move(pos, direction, steps):
+    x, y = pos
+    if direction == 0: x += steps
+    elif direction == 90: y += steps
+    elif direction == 180: x -= steps
+    elif direction == 270: y -= steps
+    return (x, y)
+
+def parse_code(lines):
+    """Compile code lines into a Program. Supports repeat(k){ ... } blocks."""
+    return compile_program(lines)
+
+# === INTERPRETER ===
+# One core, _run, executes micro-steps for every entry point: the REPL's
+# step_execution and micro_steps, run_to_end for grading and run_code.
+# A micro-step is what one press of Step does: start a move, move one
+# tile, turn, collect, destroy or end. Loop control takes no step.
+#
+# Rules: a move stops in front of a blocked tile, gas that has not been
+# destroyed or the map edge, and the program carries on with the next
+# instruction. destroy; clears gas on the tile ahead, else underfoot.
+# Items can be walked over; collect; picks one up underfoot. Reaching the
+# end tile finishes a run.
+
+# Outcomes of a whole run. A run that did not reach the goal reports the
+# first fault it met, or NOT_AT_GOAL when there was none.
+RUNNING = 0
+SUCCESS = 1
+OUT_OF_BOUNDS = 2
+BLOCKED = 3
+GAS_NOT_DESTROYED = 4
+NOTHING_TO_COLLECT = 5
+NOTHING_TO_DESTROY = 6
+NOT_AT_GOAL = 7
+TICK_LIMIT = 8
+
+OUTCOME_MESSAGES = (
+    "Running",
+    "Good job! Mission complete in {} moves!",
+    "Out of bounds!",
+    "Blocked tile!",
+    "Toxic gas not destroyed!",
+    "Nothing to collect!",
+    "Nothing to destroy!",
+    "Rover did not reach the goal!",
+    "Tick limit reached",
+)
+
+# Micro-step events. Faults use their outcome code and reaching the end is SUCCESS.
+EV_IDLE = 16
+EV_CANCELED = 17
+EV_MOVE_STARTED = 18
+EV_MOVED = 19
+EV_ZERO_MOVE = 20
+EV_TURNED = 21
+EV_COLLECTED = 22
+EV_DESTROYED = 23
+EV_ENDED = 24
+
+# event -> (REPL status, whether the step stopped something)
+STEP_MESSAGES = {
+    EV_IDLE: ("No commands queued.", True),
+    EV_CANCELED: ("Move canceled (queue cleared).", True),
+    EV_MOVE_STARTED: ("Starting move of {} steps", False),
+    EV_MOVED: ("Moved 1 step. {} remaining", False),
+    EV_ZERO_MOVE: ("Zero move ignored", False),
+    EV_TURNED: ("Turned {}°", False),
+    EV_COLLECTED: ("Collected item", False),
+    EV_DESTROYED: ("Destroyed gas at {}", False),
+    EV_ENDED: ("Program ended", True),
+    SUCCESS: ("Mission complete! All objectives achieved!", True),
+    OUT_OF_BOUNDS: ("Out of bounds!", True),
+    BLOCKED: ("Hit blocked tile!", True),
+    GAS_NOT_DESTROYED: ("Toxic gas ahead — use destroy; then move(1);", True),
+    NOTHING_TO_COLLECT: ("Nothing to collect here!", True),
+    NOTHING_TO_DESTROY: ("No gas ahead or underfoot to destroy.", True),
+}
+
+
+def _run(grid, state, budget, end=None, runs=None, trace=True):
+    """Run up to budget micro-steps of state's queue, updating state.
+
+    Stops early when the queue runs dry or the rover reaches end. Returns
+    (event, detail, steps, moved, fault, runs): the last event and its
+    detail for the status text, micro-steps run, tiles moved, the first
+    fault (0 for none) and the RunIndex used for long moves, if any.
+    trace=False skips recording visited tiles.
+    """
+    height, width = len(grid), len(grid[0])
+    ops, args = state.program.ops, state.program.args
+    n = len(ops)
+    pc, loops = state.pc, state.loop_stack
+    x, y = state.pos
+    d = state.direction
+    dx, dy = STEPS.get(d, (0, 0))   # other angles leave the rover where it is
+    remaining = state.move_remaining
+    destroyed = state.destroyed
+    ex, ey = end if end is not None else (-1, -1)
+    shared = runs is not None
+    event, detail, steps, moved, fault = EV_IDLE, 0, 0, 0, 0
+
+    while steps < budget:
+        # Loop control up to the next action
+        while pc < n:
+            op = ops[pc]
+            if op == OP_REPEAT:
+                loops.append((pc + 1, args[pc]))
+                pc += 1
+            elif op == OP_LOOP:
+                body, left = loops.pop()
+                if left > 1:
+                    loops.append((body, left - 1))
+                    pc = body
+                else:
+                    pc += 1
+            else:
+                break
+        else:
+            if remaining:
+                remaining = 0
+                event = EV_CANCELED
+                steps += 1
+                continue
+            event = EV_IDLE
+            break
+        arg = args[pc]
+        steps += 1
+
+        if op == OP_MOVE:
+            if remaining == 0:
+                if arg <= 0:
+                    pc += 1
+                    event, detail = EV_ZERO_MOVE, 0
+                    continue
+                remaining = arg
+                event, detail = EV_MOVE_STARTED, arg
+                if steps >= budget:
+                    continue
+                steps += 1   # carry on with the first tile in the same pass
+            walk = budget - steps + 1   # tiles this call may still step
+            if walk > remaining:
+                walk = remaining
+            if walk >= INDEXED_MOVE_MIN:
+                # Walk the free tiles ahead in one go; the next step meets what stops the move
+                if runs is None:
+                    runs = RunIndex(grid)
+                    bits = destroyed
+                    while bits:
+                        i = (bits & -bits).bit_length() - 1
+                        runs.clear((i % width, i // width))
+                        bits &= bits - 1
+                free = runs.free((x, y), d)
+                k = walk if free is not None and free > walk else free or 0
+                if (dx and y == ey and 0 < (ex - x) * dx <= k) or (dy and x == ex and 0 < (ey - y) * dy <= k):
+                    k = (ex - x) * dx + (ey - y) * dy
+                if k > 1:
+                    if trace:
+                        for j in range(1, k + 1):
+                            state.visit((x + dx * j, y + dy * j))
+                    x, y = x + dx * k, y + dy * k
+                    moved += k
+                    remaining -= k
+                    steps += k - 1
+                    if remaining == 0:
+                        pc += 1
+                    event, detail = EV_MOVED, remaining
+                    if x == ex and y == ey:
+                        event = SUCCESS
+                        break
+                    continue
+            # Tile by tile; each tile, and a failed attempt, is one micro-step
+            event = EV_MOVED
+            taken = 0
+            for _ in range(walk):
+                nx, ny = x + dx, y + dy
+                if nx < 0 or ny < 0 or nx >= width or ny >= height:
+                    event = OUT_OF_BOUNDS
+                    break
+                tile = grid[ny][nx]
+                if tile == "X":
+                    event = BLOCKED
+                    break
+                if tile == "G" and not destroyed >> (ny * width + nx) & 1:
+                    event = GAS_NOT_DESTROYED
+                    break
+                x, y = nx, ny
+                taken += 1
+                if trace:
+                    state.visit((x, y))
+                if x == ex and y == ey:
+                    event = SUCCESS
+                    break
+            moved += taken
+            remaining -= taken
+            if event == EV_MOVED or event == SUCCESS:
+                steps += taken - 1
+                if remaining == 0:
+                    pc += 1
+                detail = remaining
+                if event == SUCCESS:
+                    break
+                continue
+            steps += taken
+            remaining = 0
+            pc += 1
+            fault = fault or event
+            continue
+
+        remaining = 0
+        pc += 1
+        if op == OP_TURN:
+            d = (d + arg) % 360
+            dx, dy = STEPS.get(d, (0, 0))
+            event, detail = EV_TURNED, arg
+        elif op == OP_COLLECT:
+            if grid[y][x] == "I":
+                state.collected |= 1 << (y * width + x)
+                event = EV_COLLECTED
+            else:
+                event = NOTHING_TO_COLLECT
+                fault = fault or event
+        elif op == OP_DESTROY:
+            ax, ay = x + dx, y + dy
+            if 0 <= ax < width and 0 <= ay < height and grid[ay][ax] == "G":
+                where = (ax, ay)
+            elif grid[y][x] == "G":
+                where = (x, y)
+            else:
+                where = None
+            if where is None:
+                event = NOTHING_TO_DESTROY
+                fault = fault or event
+            else:
+                destroyed |= 1 << (where[1] * width + where[0])
+                if shared:
+                    runs, shared = runs.copy(), False
+                if runs is not None:
+                    runs.clear(where)
+                event, detail = EV_DESTROYED, where
+        else:   # end.
+            state.clear_queue()
+            ops, args, n, pc, loops = state.program.ops, state.program.args, 0, 0, state.loop_stack
+            event = EV_ENDED
+
+    state.pc = pc
+    state.pos = (x, y)
+    state.direction = d
+    state.move_remaining = remaining
+    state.destroyed = destroyed
+    return event, detail, steps, moved, fault, runs
+
+
+def step_execution(grid, state, trace=True):
+    """Perform a single micro-step of state's queue (REPL).
+       Updates state in place and returns (status, finished_bool_for_step_batch)"""
+    event, detail = _run(grid, state, 1, trace=trace)[:2]
+    text, finished = STEP_MESSAGES[event]
+    return text.format(detail), finished
+
+
+def micro_steps(grid, state, end=None):
+    """Resumable REPL execution: every next() runs one micro-step and yields (status, finished).
+
+    Code queued on state between steps is picked up; with nothing queued
+    it keeps yielding the idle status. Reaching end yields SUCCESS's status.
+    """
+    while True:
+        event, detail = _run(grid, state, 1, end)[:2]
+        text, finished = STEP_MESSAGES[event]
+        yield text.format(detail), finished
+
+
+def run_to_end(grid, state, end, max_ticks=None, runs=None, trace=False):
+    """Run state's queue to completion, without status texts; returns (outcome, tiles moved).
+
+    max_ticks caps the micro-steps run (TICK_LIMIT); runs is an optional
+    RunIndex of grid to share between runs on the same map, copied before
+    a run destroys gas.
+    """
+    budget = sys.maxsize if max_ticks is None else max_ticks
+    event, _, _, moved, fault, _ = _run(grid, state, budget, end, runs, trace)
+    if event == SUCCESS:
+        return SUCCESS, moved
+    if event != EV_IDLE and state.next_op() is not None:
+        return TICK_LIMIT, moved
+    return fault or NOT_AT_GOAL, moved
+
+
+# (Optional run tester — not used by REPL)
+def run_code(grid, start, end, code, runs=None):
+    """Run a whole program (a Program, or code lines to compile) from start.
+
+    Returns (ok, visited tiles in order, message).
+    """
+    if not isinstance(code, Program):
+        code = compile_program(code)
+    state = RoverState.for_grid(grid, start)
+    state.program = code   # never changed in place, so no copy is needed
+    outcome, moved = run_to_end(grid, state, end, runs=runs, trace=True)
+    return outcome == SUCCESS, state.trail, OUTCOME_MESSAGES[outcome].format(moved)
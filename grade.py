@@ -0,0 +1,237 @@
+"""Grade a directory of rover programs against a range of seeded maps.
+
+Every submission file is compiled and optimized once and run on every map
+generate_grid(seed, size) for the seeds given, with the same rules as the
+game (engine.run_to_end, via the batch simulator). Submissions are split into chunks that a process
+pool runs as batches; the maps are encoded once and handed to each worker
+when it starts. One report row per (submission, seed):
+
+    python grade.py submissions/ --seeds 0:50 --out report.csv
+    python grade.py submissions/ --seeds 7 --out - > report.jsonl
+    python grade.py submissions/ --cache grades.sqlite   # reuse earlier results
+    python grade.py submissions/ --pack easy.rvmp --seeds 0:1000
+
+With --pack, the "seeds" are map numbers in a map pack; every worker
+memory-maps the pack itself, so the maps are shared rather than copied.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch import MESSAGES, SUCCESS, as_grid_array, run_batch
+from compiler import compile_source, optimize
+from engine import GRID_SIZE, generate_grid
+from mappack import MapPack
+from resultcache import ResultCache, map_key, program_key, result_key
+
+DEFAULT_MAX_TICKS = 10_000   # stops programs like repeat(1000000){turn(90);}
+FIELDS = ("submission", "seed", "success", "moves", "reason")
+
+_maps = None   # (grids, starts, ends, map numbers to use) in each worker
+
+
+def load_submissions(directory):
+    """(name, source) for every file in directory, by name."""
+    out = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and not name.startswith("."):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                out.append((name, f.read()))
+    return out
+
+
+def load_maps(seeds, size=GRID_SIZE):
+    """The seeded maps as (grids, starts, ends) arrays for the batch simulator."""
+    grids, starts, ends = [], [], []
+    for seed in seeds:
+        grid, start, end = generate_grid(seed, size)
+        grids.append(grid)
+        starts.append(start)
+        ends.append(end)
+    return as_grid_array(grids), np.array(starts), np.array(ends)
+
+
+def _init_worker(maps):
+    """maps is (grids, starts, ends) or (map pack path, map numbers)."""
+    global _maps
+    if isinstance(maps[0], str):
+        pack = MapPack(maps[0])
+        _maps = (pack.grids, pack.starts, pack.ends, np.asarray(maps[1], np.intp))
+    else:
+        _maps = (*maps, np.arange(len(maps[0])))
+
+
+def _grade_chunk(job):
+    programs, lanes, max_ticks = job
+    grids, starts, ends, numbers = _maps
+    picks = numbers[[m for _, m in lanes]]
+    result = run_batch([programs[p] for p, _ in lanes], grids[picks], starts[picks],
+                       ends[picks], max_ticks)
+    return result.status, result.move_count
+
+
+def parse_seeds(text):
+    """'7' -> [7], '0:50' -> 0..49, '1,5,9' -> [1, 5, 9]."""
+    seeds = []
+    for part in text.split(","):
+        if ":" in part:
+            first, last = part.split(":")
+            seeds.extend(range(int(first), int(last)))
+        else:
+            seeds.append(int(part))
+    return seeds
+
+
+def grade(submissions, seeds, size=GRID_SIZE, workers=None, chunk=None,
+          max_ticks=DEFAULT_MAX_TICKS, cache=None, pack=None):
+    """Yield a report row (dict of FIELDS) per submission and seed.
+
+    With a ResultCache, (program, map) pairs it already knows are not run
+    again, and the new outcomes are added to it. With a map pack path,
+    seeds are map numbers in the pack and size is ignored.
+    """
+    if pack is None:
+        maps = load_maps(seeds, size)
+    else:
+        count = len(MapPack(pack))
+        if any(not 0 <= s < count for s in seeds):
+            raise ValueError(f"{pack} has maps 0 to {count - 1} only")
+        maps = (pack, list(seeds))
+    _init_worker(maps)
+    grids, starts, ends, numbers = _maps
+    compiled, errors = [], {}
+    for name, source in submissions:
+        try:
+            compiled.append((name, optimize(compile_source(source))))
+        except ValueError as e:
+            errors[name] = f"Parse error: {e}"
+
+    # (program, map) -> (status, moves), from the cache or from the runs below
+    outcomes = {}
+    keys = {}
+    copies = {}   # (program, map) -> the pair with the same key that is run instead
+    if cache is not None:
+        first = {}
+        map_digests = [map_key(grids[m], starts[m], ends[m]) for m in numbers]
+        for p, (_, program) in enumerate(compiled):
+            digest = program_key(program)
+            for m, map_digest in enumerate(map_digests):
+                key = result_key(digest, map_digest, max_ticks)
+                if key in first:
+                    copies[p, m] = first[key]
+                    continue
+                first[key] = (p, m)
+                found = cache.get(key)
+                if found is None:
+                    keys[p, m] = key
+                else:
+                    outcomes[p, m] = found
+    missing = {}
+    for p in range(len(compiled)):
+        lanes = [m for m in range(len(seeds)) if (p, m) not in outcomes and (p, m) not in copies]
+        if lanes:
+            missing[p] = lanes
+
+    workers = workers or os.cpu_count() or 1
+    if chunk is None:
+        chunk = max(1, -(-len(missing) // (workers * 4)))
+    order = list(missing)
+    jobs = []
+    for i in range(0, len(order), chunk):
+        batch = order[i:i + chunk]
+        jobs.append(([compiled[p][1] for p in batch],
+                     [(n, m) for n, p in enumerate(batch) for m in missing[p]], max_ticks))
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(maps,)) as pool:
+            results = list(pool.map(_grade_chunk, jobs))
+    else:
+        results = [_grade_chunk(job) for job in jobs]
+
+    for i, (status, moves) in enumerate(results):
+        batch = order[i * chunk:(i + 1) * chunk]
+        for (n, m), s, k in zip(jobs[i][1], status, moves):
+            outcomes[batch[n], m] = (int(s), int(k))
+    for pm, same in copies.items():
+        outcomes[pm] = outcomes[same]
+    if cache is not None:
+        cache.put_many((keys[pm], outcomes[pm]) for pm in keys)
+
+    p = 0
+    for name, _ in submissions:
+        if name in errors:
+            for seed in seeds:
+                yield {"submission": name, "seed": seed, "success": False, "moves": 0,
+                       "reason": errors[name]}
+            continue
+        for m, seed in enumerate(seeds):
+            s, k = outcomes[p, m]
+            yield {"submission": name, "seed": seed, "success": s == SUCCESS,
+                   "moves": k, "reason": None if s == SUCCESS else MESSAGES[s]}
+        p += 1
+
+
+def write_report(rows, out, fmt):
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            out.write(json.dumps(row) + "\n")
+            count += 1
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Grade rover programs on seeded maps")
+    parser.add_argument("directory", help="directory of program files, one per submission")
+    parser.add_argument("--seeds", default="0:50", help="seeds as N, A:B (B excluded) or a comma list")
+    parser.add_argument("--size", type=int, default=GRID_SIZE, help="map size in tiles per side")
+    parser.add_argument("--out", default="report.jsonl", help="report file, or - for stdout")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="default: from the --out extension")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--chunk", type=int, default=None, help="submissions per task")
+    parser.add_argument("--max-ticks", type=int, default=DEFAULT_MAX_TICKS,
+                        help="instruction ticks before a program is stopped")
+    parser.add_argument("--cache", default=None, metavar="PATH",
+                        help="sqlite file of earlier results to reuse and extend")
+    parser.add_argument("--pack", default=None, metavar="PATH",
+                        help="grade on maps of this map pack; --seeds picks map numbers")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    seeds = parse_seeds(args.seeds)
+    submissions = load_submissions(args.directory)
+    fmt = args.format or ("csv" if args.out.endswith(".csv") else "jsonl")
+    began = time.perf_counter()
+    cache = ResultCache(args.cache) if args.cache else None
+    rows = grade(submissions, seeds, args.size, args.workers, args.chunk, args.max_ticks, cache,
+                 args.pack)
+    if args.out == "-":
+        count = write_report(rows, sys.stdout, fmt)
+    else:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            count = write_report(rows, f, fmt)
+    print(f"graded {len(submissions)} submissions x {len(seeds)} maps ({count} rows) "
+          f"in {time.perf_counter() - began:.2f} s", file=sys.stderr)
+    if cache is not None:
+        print(cache.stats(), file=sys.stderr)
+        cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
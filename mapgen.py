@@ -0,0 +1,108 @@
+"""Seeded bulk map generation into compact uint8 arrays.
+
+A map set is keyed by a seed: map #i of seed s is always the same map, no
+matter how many maps are generated at once or how many processes share
+the work. Maps are produced in blocks of block_size(size) maps, about
+BLOCK_TILES tiles each, every block drawn from its own NumPy generator
+seeded with (seed, size, block), and follow the same rules as
+engine.generate_grid.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from engine import (
+    GRID_SIZE, TILE_BLOCKED, TILE_EMPTY, TILE_END, TILE_GAS, TILE_ITEM,
+    TILE_START, decode_grid,
+)
+
+BLOCK_TILES = 1024 * GRID_SIZE * GRID_SIZE   # tiles per generator block (1024 default-size maps)
+
+# Tile odds, as in engine.generate_grid
+PATH_EMPTY = 0.3
+PATH_GAS = 0.5      # remaining 0.2 are items
+BLOCKED_ODDS = 0.45
+
+
+def map_endpoints(size=GRID_SIZE):
+    """(start, end) of every generated map of this size."""
+    return (0, 0), (size - 1, size - 1)
+
+
+def block_size(size=GRID_SIZE):
+    """Maps per generator block for this map size; big maps get one block each."""
+    return max(1, BLOCK_TILES // (size * size))
+
+
+def generate_block(seed, block, size=GRID_SIZE):
+    """All maps of one block as a (block_size(size), size, size) uint8 array."""
+    rng = np.random.default_rng([seed, size, block])
+    n = block_size(size)
+    lanes = np.arange(n)
+
+    # Guaranteed path: a monotone walk kept as a boolean mask
+    path = np.zeros((n, size, size), bool)
+    path[:, 0, 0] = True
+    x = np.zeros(n, np.intp)
+    y = np.zeros(n, np.intp)
+    flips = rng.random((n, 2 * (size - 1))) < 0.5
+    last = size - 1
+    for step in range(2 * (size - 1)):
+        go_x = np.where((x < last) & (y < last), flips[:, step], x < last)
+        x += go_x
+        y += ~go_x
+        path[lanes, y, x] = True
+
+    # Challenges on the path, random blockers everywhere else
+    roll = rng.random((n, size, size), np.float32)[path]
+    challenge = np.full(roll.shape, TILE_ITEM, np.uint8)
+    challenge[roll < PATH_EMPTY + PATH_GAS] = TILE_GAS
+    challenge[roll < PATH_EMPTY] = TILE_EMPTY
+    del roll
+    grids = np.full((n, size, size), TILE_EMPTY, np.uint8)
+    grids[rng.random((n, size, size), np.float32) < BLOCKED_ODDS] = TILE_BLOCKED
+    grids[path] = challenge
+    grids[:, 0, 0] = TILE_START
+    grids[:, last, last] = TILE_END
+    return grids
+
+
+def generate_maps(seed, count, size=GRID_SIZE, first=0):
+    """Maps first .. first+count-1 of a seed's set as a (count, size, size) uint8 array."""
+    out = np.empty((count, size, size), np.uint8)
+    per_block = block_size(size)
+    pos = 0
+    index = first
+    while pos < count:
+        block, offset = divmod(index, per_block)
+        take = min(per_block - offset, count - pos)
+        out[pos:pos + take] = generate_block(seed, block, size)[offset:offset + take]
+        pos += take
+        index += take
+    return out
+
+
+def generate_map(seed, index, size=GRID_SIZE):
+    """Map #index of a seed's set as (grid, start, end), with grid as rows of characters."""
+    tiles = generate_maps(seed, 1, size, first=index)[0]
+    start, end = map_endpoints(size)
+    return decode_grid(tiles.tobytes(), size), start, end
+
+
+def _block_job(job):
+    seed, block, size = job
+    return block, generate_block(seed, block, size)
+
+
+def generate_maps_parallel(seed, count, size=GRID_SIZE, workers=None):
+    """generate_maps(seed, count, size) fanned out over a process pool, one task per block."""
+    per_block = block_size(size)
+    blocks = range((count + per_block - 1) // per_block)
+    out = np.empty((count, size, size), np.uint8)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for block, grids in pool.map(_block_job, [(seed, b, size) for b in blocks]):
+            begin = block * per_block
+            take = min(per_block, count - begin)
+            out[begin:begin + take] = grids[:take]
+    return out
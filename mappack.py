@@ -0,0 +1,235 @@
+"""Map packs: precomputed challenge sets in one memory-mapped file.
+
+A pack holds any number of maps of one size. MapPack maps the file
+read-only and hands out NumPy views into it, so opening a pack of a
+million maps reads only the header, map #i touches only its own pages,
+and grader processes that open the same pack share the page cache
+instead of each holding a copy.
+
+File layout (little-endian):
+    header   magic, version, map count, width, height, offset of the
+             index and of the tiles (HEADER)
+    index    one INDEX_DTYPE record per map: offset of its tiles, start,
+             end, optimal move count and instruction count (-1 when
+             unknown, -2 when unsolvable) and the seed it came from
+    tiles    width * height tile codes per map, row by row, one block
+             after the other from a page-aligned offset
+
+    python mappack.py build easy.rvmp --seeds 0:1000 --difficulty easy
+    python mappack.py build bulk.rvmp --mapgen 7 --count 1000000
+    python mappack.py info bulk.rvmp
+    python mappack.py show bulk.rvmp 123456
+"""
+import argparse
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+from engine import GRID_SIZE, decode_grid, encode_grid, generate_grid
+
+MAGIC = b"RVMP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQIIQQ")   # magic, version, reserved, count, width, height, index, tiles
+PAGE = 4096                           # tiles start on a page boundary
+UNKNOWN = -1                          # optimal moves not computed
+UNSOLVABLE = -2
+
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("start", "<u2", (2,)),
+    ("end", "<u2", (2,)),
+    ("moves", "<i4"),        # optimal tiles moved
+    ("length", "<i4"),       # instructions in that optimal program
+    ("seed", "<i8"),
+])
+
+
+# === WRITING ===
+def write_pack(path, tiles, starts, ends, moves=None, lengths=None, seeds=None):
+    """Write maps as a pack: tiles is a (count, height, width) uint8 array.
+
+    starts and ends are (count, 2) arrays of (x, y); moves, lengths and
+    seeds default to UNKNOWN.
+    """
+    tiles = np.ascontiguousarray(tiles, np.uint8)
+    count, height, width = tiles.shape
+    index_at = HEADER.size
+    tiles_at = -(-(index_at + count * INDEX_DTYPE.itemsize) // PAGE) * PAGE
+    index = np.zeros(count, INDEX_DTYPE)
+    index["offset"] = tiles_at + np.arange(count, dtype=np.uint64) * (width * height)
+    index["start"] = starts
+    index["end"] = ends
+    index["moves"] = UNKNOWN if moves is None else moves
+    index["length"] = UNKNOWN if lengths is None else lengths
+    index["seed"] = UNKNOWN if seeds is None else seeds
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, count, width, height, index_at, tiles_at))
+        f.write(index.tobytes())
+        f.write(bytes(tiles_at - f.tell()))
+        f.write(tiles.data)
+
+
+# === READING ===
+class MapPack:
+    """Read-only, zero-copy view of a pack file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < HEADER.size:
+            raise ValueError(f"{path} is not a map pack")
+        magic, version, _, count, width, height, index_at, tiles_at = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a map pack")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported map pack version {version}")
+        if tiles_at + count * width * height > len(self.mm):
+            raise ValueError(f"{path} is truncated")
+        self.count, self.width, self.height = count, width, height
+        self.index = np.frombuffer(self.mm, INDEX_DTYPE, count, index_at)
+        self.starts = self.index["start"]
+        self.ends = self.index["end"]
+        # Every writer lays the tiles out back to back, so they also form one array
+        self.grids = np.frombuffer(self.mm, np.uint8, count * width * height,
+                                   tiles_at).reshape(count, height, width)
+
+    def __len__(self):
+        return self.count
+
+    def tiles(self, i):
+        """Tile codes of map #i as a (height, width) view into the file."""
+        offset = int(self.index["offset"][i])
+        tiles = np.frombuffer(self.mm, np.uint8, self.width * self.height, offset)
+        return tiles.reshape(self.height, self.width)
+
+    def map(self, i):
+        """Map #i as (grid, start, end), with grid as rows of tile characters."""
+        record = self.index[i]
+        grid = decode_grid(self.tiles(i).tobytes(), self.width)
+        return grid, tuple(record["start"].tolist()), tuple(record["end"].tolist())
+
+    def meta(self, i):
+        record = self.index[i]
+        return {"moves": int(record["moves"]), "length": int(record["length"]),
+                "seed": int(record["seed"])}
+
+    def close(self):
+        self.index = self.starts = self.ends = self.grids = None
+        try:
+            self.mm.close()
+        except BufferError:
+            pass   # views handed out still use the mapping; it closes with them
+
+
+# === BUILDING ===
+def build_from_seeds(path, seeds, size=GRID_SIZE, solve_maps=False, solvable_only=False,
+                     difficulties=None):
+    """Pack generate_grid(seed, size) for each seed, optionally with optimal solutions.
+
+    difficulties, a set of solver.rate_length ratings, keeps only the maps
+    rated one of them (and implies solvable_only).
+    """
+    if solve_maps or solvable_only or difficulties:
+        from solver import rate_length, solve
+    tiles, starts, ends, moves, lengths, kept = [], [], [], [], [], []
+    for seed in seeds:
+        grid, start, end = generate_grid(seed, size)
+        best = UNKNOWN, UNKNOWN
+        if solve_maps or solvable_only or difficulties:
+            solution = solve(grid, start, end)
+            if solution is None:
+                if solvable_only or difficulties:
+                    continue
+                best = UNSOLVABLE, UNSOLVABLE
+            else:
+                if difficulties and rate_length(len(solution)) not in difficulties:
+                    continue
+                best = solution.moves, len(solution)
+        tiles.append(np.frombuffer(encode_grid(grid), np.uint8).reshape(size, size))
+        starts.append(start)
+        ends.append(end)
+        moves.append(best[0])
+        lengths.append(best[1])
+        kept.append(seed)
+    tiles = np.stack(tiles) if tiles else np.zeros((0, size, size), np.uint8)
+    write_pack(path, tiles, np.array(starts).reshape(-1, 2), np.array(ends).reshape(-1, 2),
+               moves, lengths, kept)
+    return len(kept)
+
+
+def build_from_mapgen(path, seed, count, size=GRID_SIZE, workers=None):
+    """Pack maps 0..count-1 of mapgen's set for seed (fast; no solutions)."""
+    from mapgen import generate_maps_parallel, map_endpoints
+    tiles = generate_maps_parallel(seed, count, size, workers)
+    start, end = map_endpoints(size)
+    write_pack(path, tiles, np.tile(start, (count, 1)), np.tile(end, (count, 1)),
+               seeds=seed)
+    return count
+
+
+# === COMMAND LINE ===
+def parse_difficulties(text):
+    from solver import DIFFICULTIES
+    wanted = set(text.split(","))
+    if not wanted <= set(DIFFICULTIES):
+        raise argparse.ArgumentTypeError(f"difficulties are {', '.join(DIFFICULTIES)}")
+    return wanted
+
+
+def parse_args(argv=None):
+    from grade import parse_seeds
+    parser = argparse.ArgumentParser(description="Build and inspect map packs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="write a pack")
+    build.add_argument("path")
+    build.add_argument("--size", type=int, default=GRID_SIZE)
+    build.add_argument("--seeds", type=parse_seeds, help="generate_grid seeds: N, A:B or a comma list")
+    build.add_argument("--mapgen", type=int, metavar="SEED", help="use mapgen's bulk set for SEED")
+    build.add_argument("--count", type=int, default=1000, help="maps to take with --mapgen")
+    build.add_argument("--solve", action="store_true", help="record optimal solutions (--seeds only)")
+    build.add_argument("--solvable-only", action="store_true", help="leave out unsolvable maps")
+    build.add_argument("--difficulty", type=parse_difficulties, metavar="LIST",
+                       help="keep only maps rated easy, normal and/or hard, e.g. easy,normal (--seeds only)")
+    build.add_argument("--workers", type=int, default=None)
+    info = sub.add_parser("info", help="summarise a pack")
+    info.add_argument("path")
+    show = sub.add_parser("show", help="print one map")
+    show.add_argument("path")
+    show.add_argument("number", type=int)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "build":
+        if args.mapgen is not None:
+            count = build_from_mapgen(args.path, args.mapgen, args.count, args.size, args.workers)
+        else:
+            count = build_from_seeds(args.path, args.seeds or range(50), args.size,
+                                     args.solve, args.solvable_only, args.difficulty)
+        print(f"wrote {count} maps to {args.path}")
+    elif args.command == "info":
+        pack = MapPack(args.path)
+        moves = pack.index["moves"]
+        solved = moves[moves >= 0]
+        print(f"{pack.count} maps of {pack.width}x{pack.height}")
+        if solved.size:
+            from solver import DIFFICULTIES, rate_length
+            print(f"{solved.size} with optimal solutions, moves {solved.min()}-{solved.max()}"
+                  f" (mean {solved.mean():.1f})")
+            ratings = [rate_length(n) for n in pack.index["length"][moves >= 0].tolist()]
+            print(", ".join(f"{ratings.count(d)} {d}" for d in DIFFICULTIES))
+        print(f"{int((moves == UNSOLVABLE).sum())} unsolvable, {int((moves == UNKNOWN).sum())} unknown")
+    else:
+        pack = MapPack(args.path)
+        grid, start, end = pack.map(args.number)
+        print(f"map {args.number}: start {start}, end {end}, {pack.meta(args.number)}")
+        for row in grid:
+            print("".join(row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
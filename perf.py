@@ -0,0 +1,123 @@
+"""Per-frame timings of the game loop, for the HUD, hooks and CSV dumps.
+
+The loop calls begin_frame() once per frame and lap(phase) after each of
+its phases; a lap is the time since the previous lap or the frame start.
+count() adds to per-frame counters (micro-steps run) and gauge() records
+a per-frame value (queue length). end_frame() closes the frame, keeps it
+in a rolling window of the last WINDOW frames and passes it to every
+hook, e.g. a CsvDump. Nothing here needs pygame.
+"""
+import csv
+import time
+from collections import deque
+
+PHASES = ("events", "simulation", "tiles", "panels", "flip", "idle")
+WINDOW = 60   # frames averaged for the summary
+
+
+class FrameStats:
+    """Timings of one frame: milliseconds per phase, counters and gauges."""
+    __slots__ = ("number", "total_ms", "phases", "counters", "gauges")
+
+    def __init__(self, number):
+        self.number = number
+        self.total_ms = 0.0
+        self.phases = {}
+        self.counters = {}
+        self.gauges = {}
+
+
+class Profiler:
+    """Collects FrameStats for the frame in progress and the last WINDOW frames."""
+
+    def __init__(self, window=WINDOW, clock=time.perf_counter):
+        self.clock = clock
+        self.frames = deque(maxlen=window)
+        self.hooks = []
+        self.current = None
+        self.number = 0
+        self.began = self.last = 0.0
+
+    def add_hook(self, hook):
+        """Call hook(FrameStats) at the end of every frame."""
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def begin_frame(self):
+        self.number += 1
+        self.current = FrameStats(self.number)
+        self.began = self.last = self.clock()
+
+    def lap(self, phase):
+        """Charge the time since the last lap to phase."""
+        if self.current is None:
+            return
+        now = self.clock()
+        phases = self.current.phases
+        phases[phase] = phases.get(phase, 0.0) + (now - self.last) * 1000
+        self.last = now
+
+    def count(self, name, n=1):
+        if self.current is not None:
+            counters = self.current.counters
+            counters[name] = counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if self.current is not None:
+            self.current.gauges[name] = value
+
+    def end_frame(self):
+        frame = self.current
+        if frame is None:
+            return None
+        frame.total_ms = (self.clock() - self.began) * 1000
+        self.frames.append(frame)
+        self.current = None
+        for hook in self.hooks:
+            hook(frame)
+        return frame
+
+    def summary(self):
+        """Averages over the window: fps, frame_ms, ms per phase, counters per second, last gauges."""
+        frames = self.frames
+        if not frames:
+            return None
+        total = sum(f.total_ms for f in frames)
+        phases = {}
+        counters = {}
+        for f in frames:
+            for name, ms in f.phases.items():
+                phases[name] = phases.get(name, 0.0) + ms
+            for name, n in f.counters.items():
+                counters[name] = counters.get(name, 0) + n
+        seconds = total / 1000 or 1e-9
+        return {
+            "fps": len(frames) / seconds,
+            "frame_ms": total / len(frames),
+            "phases": {name: ms / len(frames) for name, ms in phases.items()},
+            "per_second": {name: n / seconds for name, n in counters.items()},
+            "gauges": dict(frames[-1].gauges),
+        }
+
+
+class CsvDump:
+    """Profiler hook writing one CSV row per frame."""
+
+    def __init__(self, path, phases=PHASES, counters=("steps",), gauges=("queue",)):
+        self.file = open(path, "w", newline="")
+        self.phases, self.counters, self.gauges = phases, counters, gauges
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(("frame", "total_ms") + tuple(f"{p}_ms" for p in phases)
+                             + tuple(counters) + tuple(gauges))
+
+    def __call__(self, frame):
+        self.writer.writerow(
+            [frame.number, f"{frame.total_ms:.3f}"]
+            + [f"{frame.phases.get(p, 0.0):.3f}" for p in self.phases]
+            + [frame.counters.get(c, 0) for c in self.counters]
+            + [frame.gauges.get(g, "") for g in self.gauges])
+
+    def close(self):
+        self.file.close()
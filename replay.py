@@ -0,0 +1,310 @@
+"""Compact binary traces of REPL micro-steps, with snapshots for seeking.
+
+Every micro-step (step_execution or micro_steps) becomes one fixed-width record: the opcode it
+worked on, flags (step stopped, gas destroyed, item collected), the
+heading and position afterwards, and where the destroyed or collected
+tile was relative to the rover. Records are grouped in segments of at
+most SEGMENT_STEPS. Each segment starts with a snapshot of the gas and
+item progress so far and is stored zlib-compressed, so seeking to any
+step reads one snapshot and replays at most SEGMENT_STEPS records.
+
+A program run to its end in one go (To End) is a single OP_RUN record at
+the start of a new segment, whose snapshot already holds the gas and
+items the run cleared.
+
+File layout (little-endian):
+    header   magic, version, segment size, map width and height, start
+             position and heading, the seed of a chunked map, then the
+             zlib-compressed tile codes (left out for chunked maps, which
+             are regenerated from their seed, and for other maps bigger
+             than MAX_EMBEDDED_TILES)
+    segments compressed snapshot length, compressed records length, data
+    footer   offset of every segment, the step each segment starts at,
+             then step count, index offset, magic
+
+    python replay.py session.rvt 120   # show the map around step 120
+"""
+import struct
+import sys
+import zlib
+from array import array
+
+from chunks import ChunkedGrid
+from bisect import bisect_right
+
+from compiler import OP_NAMES, OP_TURN
+from engine import TILE_CHARS, TILE_EMPTY, decode_grid, encode_grid, run_to_end, step_execution
+
+MAGIC = b"RVTR"
+VERSION = 3                  # 2: chunked map seed, 3: segment start steps; older traces still load
+SEGMENT_STEPS = 256          # records per segment (and steps between snapshots)
+MAX_EMBEDDED_TILES = 1 << 18  # maps above this (512x512) are saved without tiles
+
+# op, flags, heading in degrees, x, y, destroyed/collected tile - (x, y)
+RECORD = struct.Struct("<BBHHHbb")
+HEADER = struct.Struct("<4sBHHHHHHIBq")   # ..., tiles length, has seed, chunked map seed
+HEADER_V1 = struct.Struct("<4sBHHHHHHI")
+SEGMENT = struct.Struct("<II")
+FOOTER = struct.Struct("<QQ4s")
+
+OP_NONE = 255                # step_execution found nothing queued
+OP_RUN = 254                 # the rest of the program run in one go
+FLAG_STOPPED = 1             # the step returned finished=True
+FLAG_DESTROYED = 2
+FLAG_COLLECTED = 4
+
+
+def _pack_snapshot(destroyed, collected):
+    coords = array("H")
+    for x, y in destroyed:
+        coords.extend((x, y))
+    for x, y in collected:
+        coords.extend((x, y))
+    return zlib.compress(struct.pack("<II", len(destroyed), len(collected)) + coords.tobytes())
+
+
+def _cells(bits, width):
+    """(x, y) of every set bit of a progress bitset."""
+    digits = bin(bits)[:1:-1]   # bit 0 first
+    cells = []
+    i = digits.find("1")
+    while i >= 0:
+        cells.append((i % width, i // width))
+        i = digits.find("1", i + 1)
+    return cells
+
+
+def _unpack_snapshot(data):
+    data = zlib.decompress(data)
+    n_destroyed, _ = struct.unpack_from("<II", data)
+    coords = array("H", data[8:])
+    cells = list(zip(coords[::2], coords[1::2]))
+    return set(cells[:n_destroyed]), set(cells[n_destroyed:])
+
+
+class TraceRecorder:
+    """Records the micro-steps of one map into a trace."""
+
+    def __init__(self, grid, start, direction=0):
+        self.width, self.height = len(grid[0]), len(grid)
+        self.map_seed = None
+        self.tiles = b""
+        if isinstance(grid, ChunkedGrid):
+            # encoding would generate every chunk; the seed brings them back
+            if -(1 << 63) <= grid.seed < (1 << 63):
+                self.map_seed = grid.seed
+        elif self.width * self.height <= MAX_EMBEDDED_TILES:
+            self.tiles = encode_grid(grid)
+        self.start = start
+        self.direction = direction
+        self.steps = 0
+        self.destroyed = set()
+        self.collected = set()
+        self.segments = []        # finished segments as (snapshot, records), compressed
+        self.firsts = []          # step each finished segment starts after
+        self.first = 0            # ... and the same for the open one
+        self.snapshot = _pack_snapshot((), ())
+        self.buffer = bytearray()
+
+    def step(self, grid, state, stepper=None):
+        """engine.step_execution, with the step appended to the trace.
+
+        stepper, an engine.micro_steps generator over the same grid and
+        state, runs the step instead when given.
+        """
+        op = state.next_op()
+        destroyed, collected = state.destroyed, state.collected
+        status, stopped = step_execution(grid, state) if stepper is None else next(stepper)
+        (x, y), direction = state.pos, state.direction
+        flags = FLAG_STOPPED if stopped else 0
+        dx = dy = 0
+        if state.destroyed != destroyed:
+            gained = (state.destroyed & ~destroyed).bit_length() - 1
+            ay, ax = divmod(gained, state.width)
+            flags |= FLAG_DESTROYED
+            dx, dy = ax - x, ay - y
+            self.destroyed.add((ax, ay))
+        elif state.collected != collected:
+            flags |= FLAG_COLLECTED
+            self.collected.add((x, y))
+        self.buffer += RECORD.pack(OP_NONE if op is None else op, flags, direction, x, y, dx, dy)
+        self.steps += 1
+        if len(self.buffer) == SEGMENT_STEPS * RECORD.size:
+            self._close_segment()
+        return status, stopped
+
+    def run_to_end(self, grid, state, end, max_ticks=None):
+        """engine.run_to_end, recorded as one OP_RUN step instead of one record per micro-step."""
+        destroyed, collected = state.destroyed, state.collected
+        outcome, moved = run_to_end(grid, state, end, max_ticks, trace=True)
+        self.destroyed.update(_cells(state.destroyed & ~destroyed, state.width))
+        self.collected.update(_cells(state.collected & ~collected, state.width))
+        if self.buffer:
+            self._close_segment()
+        self.snapshot = _pack_snapshot(self.destroyed, self.collected)   # includes the run's progress
+        (x, y), direction = state.pos, state.direction
+        self.buffer += RECORD.pack(OP_RUN, FLAG_STOPPED, direction, x, y, 0, 0)
+        self.steps += 1
+        return outcome, moved
+
+    def _close_segment(self):
+        self.segments.append((self.snapshot, zlib.compress(bytes(self.buffer))))
+        self.firsts.append(self.first)
+        self.first = self.steps
+        self.snapshot = _pack_snapshot(self.destroyed, self.collected)
+        self.buffer.clear()
+
+    def to_bytes(self):
+        """The trace so far in the file format above."""
+        tiles = zlib.compress(self.tiles)
+        has_seed = self.map_seed is not None
+        out = bytearray(HEADER.pack(MAGIC, VERSION, SEGMENT_STEPS, self.width, self.height,
+                                    self.start[0], self.start[1], self.direction, len(tiles),
+                                    has_seed, self.map_seed if has_seed else 0))
+        out += tiles
+        segments = list(self.segments)
+        firsts = array("Q", self.firsts)
+        if self.buffer:
+            segments.append((self.snapshot, zlib.compress(bytes(self.buffer))))
+            firsts.append(self.first)
+        offsets = array("Q")
+        for snapshot, records in segments:
+            offsets.append(len(out))
+            out += SEGMENT.pack(len(snapshot), len(records)) + snapshot + records
+        index = len(out)
+        out += offsets.tobytes()
+        out += firsts.tobytes()
+        out += FOOTER.pack(self.steps, index, MAGIC)
+        return bytes(out)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+
+class Trace:
+    """A recorded trace that can be read at any step without replaying from the start."""
+
+    def __init__(self, data):
+        magic, version = struct.unpack_from("<4sB", data)
+        if magic != MAGIC or version not in (1, 2, VERSION):
+            raise ValueError("not a rover trace")
+        header = HEADER_V1 if version == 1 else HEADER
+        fields = header.unpack_from(data)
+        _, _, self.segment_steps, self.width, self.height, sx, sy, self.direction, tiles_len = fields[:9]
+        self.map_seed = fields[10] if version > 1 and fields[9] else None
+        self.start = (sx, sy)
+        self.tiles = zlib.decompress(data[header.size:header.size + tiles_len])
+        self.steps, index, magic = FOOTER.unpack_from(data, len(data) - FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError("truncated rover trace")
+        self.offsets = array("Q", data[index:len(data) - FOOTER.size])
+        if version == VERSION:
+            count = len(self.offsets) // 2
+            self.firsts = self.offsets[count:]   # step each segment starts after
+            del self.offsets[count:]
+        else:   # fixed-size segments
+            self.firsts = array("Q", range(0, len(self.offsets) * self.segment_steps, self.segment_steps))
+        self.data = data
+        self._cached = None       # (segment number, snapshot sets, raw records)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def __len__(self):
+        return self.steps
+
+    def grid(self):
+        """The recorded map as rows of characters (a ChunkedGrid for chunked maps), or None
+        if it was too big to embed."""
+        if self.tiles:
+            return decode_grid(self.tiles, self.width)
+        if self.map_seed is not None:
+            return ChunkedGrid(self.width, self.map_seed)
+        return None
+
+    def _segment(self, number):
+        if self._cached is None or self._cached[0] != number:
+            offset = self.offsets[number]
+            snap_len, rec_len = SEGMENT.unpack_from(self.data, offset)
+            offset += SEGMENT.size
+            snapshot = _unpack_snapshot(self.data[offset:offset + snap_len])
+            records = zlib.decompress(self.data[offset + snap_len:offset + snap_len + rec_len])
+            self._cached = (number, snapshot, records)
+        return self._cached
+
+    def _locate(self, n):
+        """(segment number, index in it) of step n (1-based)."""
+        if not 1 <= n <= self.steps:
+            raise IndexError(n)
+        number = bisect_right(self.firsts, n - 1) - 1
+        return number, n - 1 - self.firsts[number]
+
+    def record(self, n):
+        """Step n (1-based) as (op, flags, heading, x, y, dx, dy)."""
+        number, i = self._locate(n)
+        _, _, records = self._segment(number)
+        return RECORD.unpack_from(records, i * RECORD.size)
+
+    def state_at(self, n):
+        """(pos, heading, destroyed gases, collected items) after n steps; 0 is the start."""
+        if n == 0:
+            return self.start, self.direction, set(), set()
+        number, last = self._locate(n)
+        _, (destroyed, collected), records = self._segment(number)
+        destroyed, collected = set(destroyed), set(collected)
+        for rec in RECORD.iter_unpack(records[:(last + 1) * RECORD.size]):
+            op, flags, heading, x, y, dx, dy = rec
+            if flags & FLAG_DESTROYED:
+                destroyed.add((x + dx, y + dy))
+            elif flags & FLAG_COLLECTED:
+                collected.add((x, y))
+        return (x, y), heading, destroyed, collected
+
+
+def describe(record):
+    """Short text for a record, e.g. 'move -> (3, 4)' or 'destroy (5, 2) (stopped)'."""
+    op, flags, heading, x, y, dx, dy = record
+    name = "idle" if op == OP_NONE else "run to end" if op == OP_RUN else OP_NAMES[op]
+    if flags & FLAG_DESTROYED:
+        text = f"{name} ({x + dx}, {y + dy})"
+    elif op == OP_TURN:
+        text = f"{name} -> {heading}°"
+    else:
+        text = f"{name} -> ({x}, {y})"
+    return text + " (stopped)" if flags & FLAG_STOPPED else text
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python replay.py TRACE [STEP]")
+        return 2
+    trace = Trace.load(argv[0])
+    n = int(argv[1]) if len(argv) > 1 else len(trace)
+    (rx, ry), heading, destroyed, collected = trace.state_at(n)
+    print(f"{argv[0]}: {len(trace)} steps on a {trace.width}x{trace.height} map")
+    if n:
+        print(f"step {n}: {describe(trace.record(n))}")
+    print(f"rover at ({rx}, {ry}) facing {heading}°, "
+          f"{len(destroyed)} gas destroyed, {len(collected)} items collected")
+    grid = trace.grid()
+    if grid is None:
+        return 0
+    for y in range(max(0, ry - 10), min(trace.height, ry + 11)):
+        row = []
+        for x in range(max(0, rx - 20), min(trace.width, rx + 21)):
+            if (x, y) == (rx, ry):
+                row.append("@")
+            elif (x, y) in destroyed or (x, y) in collected:
+                row.append(TILE_CHARS[TILE_EMPTY])
+            else:
+                row.append(grid[y][x])
+        print("".join(row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Content-addressed cache of program outcomes, in memory and in sqlite.
+
+A result is keyed by a hash of the compiled program (so formatting,
+comments and keyword case do not matter), a hash of the map's tiles,
+start and end, and the tick limit it ran under. Values are the batch
+simulator's (status, moves) pair. Recent results stay in an in-memory
+LRU of `capacity` entries; everything written also goes to an sqlite file
+that keeps at most `max_rows` rows, dropping the oldest writes first.
+
+Bump RULES_VERSION whenever the rules change, so outcomes recorded
+under the old rules are not reused.
+"""
+import hashlib
+import sqlite3
+import struct
+from collections import OrderedDict
+
+from engine import encode_grid
+
+RULES_VERSION = 2   # 2: one interpreter, step_execution's rules everywhere
+MEMORY_CAPACITY = 100_000    # entries kept in memory
+DISK_MAX_ROWS = 2_000_000    # rows kept in the sqlite file
+
+
+def _digest(*parts):
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part)
+    return h.digest()
+
+
+def program_key(program):
+    """Hash of a compiled Program's instructions."""
+    return _digest(program.ops.tobytes(), program.args.tobytes())
+
+
+def map_key(grid, start, end):
+    """Hash of a map's tiles (character rows or a uint8 array) and endpoints."""
+    tiles = grid.tobytes() if hasattr(grid, "tobytes") else encode_grid(grid)
+    width = grid.shape[1] if hasattr(grid, "shape") else len(grid[0])
+    return _digest(struct.pack("<5i", width, *start, *end), tiles)
+
+
+def result_key(program_digest, map_digest, max_ticks=None):
+    return _digest(struct.pack("<iq", RULES_VERSION, -1 if max_ticks is None else max_ticks),
+                   program_digest, map_digest)
+
+
+class ResultCache:
+    """LRU of (status, moves) by result_key, backed by an optional sqlite file."""
+
+    def __init__(self, path=None, capacity=MEMORY_CAPACITY, max_rows=DISK_MAX_ROWS):
+        self.capacity = capacity
+        self.max_rows = max_rows
+        self.memory = OrderedDict()
+        self.hits = 0          # found in memory
+        self.disk_hits = 0     # found in sqlite
+        self.misses = 0
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path)
+            self.db.execute("CREATE TABLE IF NOT EXISTS results "
+                            "(key BLOB PRIMARY KEY, status INTEGER, moves INTEGER)")
+            self.rows = self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def __len__(self):
+        return len(self.memory)
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        """(status, moves) for key, or None."""
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return value
+        if self.db is not None:
+            row = self.db.execute("SELECT status, moves FROM results WHERE key = ?",
+                                  (key,)).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self._remember(key, row)
+                return row
+        self.misses += 1
+        return None
+
+    def put_many(self, items):
+        """Store (key, (status, moves)) pairs, in one sqlite transaction."""
+        items = list(items)
+        for key, value in items:
+            self._remember(key, value)
+        if self.db is None or not items:
+            return
+        with self.db:
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO results VALUES (?, ?, ?)",
+                                ((key, int(s), int(m)) for key, (s, m) in items))
+            self.rows += self.db.total_changes - before
+            if self.rows > self.max_rows:
+                drop = self.rows - self.max_rows
+                self.db.execute("DELETE FROM results WHERE rowid IN "
+                                "(SELECT rowid FROM results ORDER BY rowid LIMIT ?)", (drop,))
+                self.rows -= drop
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        rate = (self.hits + self.disk_hits) / lookups if lookups else 0.0
+        return (f"cache: {self.hits} memory hits, {self.disk_hits} disk hits, "
+                f"{self.misses} misses ({rate:.0%} hit rate), {len(self.memory)} in memory")
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
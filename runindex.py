@@ -0,0 +1,89 @@
+"""Free-run index: how far the rover can move from a tile in each heading.
+
+free(pos, heading) is the number of tiles the rover can move before the
+next tile would be off the map, blocked or gas not yet destroyed, so a
+run-to-completion engine can settle move(n) with one lookup instead of
+checking tile by tile.
+
+Runs are kept per line: one array per (heading, row) for left/right and
+per (heading, column) for up/down, each built the first time it is asked
+for. clear() marks a destroyed gas tile as passable and drops the two
+lines through it, which are rebuilt on their next use.
+"""
+from array import array
+
+STOPPERS = frozenset("XG")    # tiles a move stops in front of until cleared
+
+# Heading in degrees -> (dx, dy)
+STEPS = {0: (1, 0), 90: (0, 1), 180: (-1, 0), 270: (0, -1)}
+
+
+class RunIndex:
+    """Lazily built free-run lengths for one grid of tile characters."""
+
+    __slots__ = ("grid", "width", "height", "cleared", "lines")
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.width, self.height = len(grid[0]), len(grid)
+        self.cleared = set()    # destroyed gas
+        self.lines = {}         # (heading, row or column) -> array of run lengths
+
+    def copy(self):
+        other = RunIndex.__new__(RunIndex)
+        other.grid, other.width, other.height = self.grid, self.width, self.height
+        other.cleared = set(self.cleared)
+        other.lines = dict(self.lines)   # arrays are replaced, never changed in place
+        return other
+
+    def free(self, pos, heading):
+        """Tiles free to move onto from pos along heading, or None for other angles."""
+        x, y = pos
+        if heading == 0 or heading == 180:
+            line, at = y, x
+        elif heading == 90 or heading == 270:
+            line, at = x, y
+        else:
+            return None
+        runs = self.lines.get((heading, line))
+        if runs is None:
+            runs = self._build(heading, line)
+        return runs[at]
+
+    def clear(self, pos):
+        """Make the tile at pos passable (gas destroyed)."""
+        x, y = pos
+        if (x, y) in self.cleared:
+            return
+        self.cleared.add((x, y))
+        for heading in (0, 180):
+            self.lines.pop((heading, y), None)
+        for heading in (90, 270):
+            self.lines.pop((heading, x), None)
+
+    def _build(self, heading, line):
+        if heading in (0, 180):
+            cells = self.grid[line]
+            stop = [c in STOPPERS for c in cells]
+            for x, y in self.cleared:
+                if y == line:
+                    stop[x] = False
+        else:
+            cells = [row[line] for row in self.grid]
+            stop = [c in STOPPERS for c in cells]
+            for x, y in self.cleared:
+                if x == line:
+                    stop[y] = False
+        n = len(stop)
+        runs = array("i", bytes(4 * n))
+        run = 0
+        if heading in (0, 90):
+            for i in range(n - 1, 0, -1):
+                run = 0 if stop[i] else run + 1
+                runs[i - 1] = run
+        else:
+            for i in range(n - 1):
+                run = 0 if stop[i] else run + 1
+                runs[i + 1] = run
+        self.lines[heading, line] = runs
+        return runs
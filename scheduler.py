@@ -0,0 +1,97 @@
+"""Fixed-timestep scheduling of simulation micro-steps, independent of rendering.
+
+The front-end asks the scheduler how much simulation to run each frame
+instead of doing one micro-step per timer tick. Timed speeds use an
+accumulator: elapsed time is banked and spent in whole steps, so the step
+rate stays the same at any frame rate. Turbo runs as many steps as fit in
+a per-frame time budget, and finish() runs until the program is done.
+"""
+import time
+
+# (label, milliseconds per micro-step); 0 means turbo
+SPEEDS = (("1x", 300), ("2x", 150), ("5x", 60), ("20x", 15), ("Turbo", 0))
+TURBO_BUDGET_MS = 8       # simulation time per frame in turbo mode
+MAX_CATCHUP_STEPS = 50    # timed steps per frame before backlog is dropped
+_CLOCK_CHECK_EVERY = 64   # steps between clock reads in budgeted loops
+
+
+class Scheduler:
+    """Decides how many micro-steps to run each frame."""
+
+    def __init__(self, speed=0, budget_ms=TURBO_BUDGET_MS, clock=time.perf_counter):
+        self.speed = speed
+        self.budget_ms = budget_ms
+        self.clock = clock
+        self.last_ms = None
+        self.banked_ms = 0
+
+    @property
+    def label(self):
+        return SPEEDS[self.speed][0]
+
+    @property
+    def step_ms(self):
+        return SPEEDS[self.speed][1]
+
+    def cycle(self):
+        """Switch to the next speed, wrapping back to the slowest."""
+        self.speed = (self.speed + 1) % len(SPEEDS)
+        self.banked_ms = 0
+
+    def restart(self, now_ms):
+        """Start timing from now, e.g. when Run is pressed."""
+        self.last_ms = now_ms
+        self.banked_ms = 0
+
+    def advance(self, step, now_ms):
+        """Run step() as often as the current speed allows up to now_ms.
+
+        step() returns False to stop early. Returns the number of steps run.
+        """
+        if self.last_ms is None:
+            self.last_ms = now_ms
+        elapsed = now_ms - self.last_ms
+        self.last_ms = now_ms
+        if self.step_ms == 0:
+            return self.run_for(step, self.budget_ms)
+
+        self.banked_ms += elapsed
+        due = int(self.banked_ms // self.step_ms)
+        self.banked_ms -= due * self.step_ms
+        if due > MAX_CATCHUP_STEPS:
+            due = MAX_CATCHUP_STEPS
+            self.banked_ms = 0
+        for n in range(due):
+            if step() is False:
+                self.banked_ms = 0
+                return n + 1
+        return due
+
+    def run_for(self, step, budget_ms):
+        """Run step() until it returns False or budget_ms of wall time is used."""
+        deadline = self.clock() + budget_ms / 1000
+        count = 0
+        while True:
+            for _ in range(_CLOCK_CHECK_EVERY):
+                count += 1
+                if step() is False:
+                    return count
+            if self.clock() >= deadline:
+                return count
+
+    def finish(self, step, slice_ms=250):
+        """Run step() toward the end of the program for at most slice_ms.
+
+        Returns True once step() has returned False. Callers keep calling
+        it each frame, without rendering, until it does.
+        """
+        done = []
+
+        def until_done():
+            if step() is False:
+                done.append(True)
+                return False
+            return True
+
+        self.run_for(until_done, slice_ms)
+        return bool(done)
@@ -0,0 +1,303 @@
+"""Rover sessions over TCP or a Unix socket, for browser front-ends.
+
+One asyncio event loop serves every connection; each connection owns a
+Session (grid, RoverState, console LineParser) and speaks JSON Lines:
+one request object per line in, one or more response objects per line out.
+
+    {"cmd": "new", "seed": 42, "size": 14}   -> {"ok": true, "grid": [...], "start": .., "end": ..}  (size 2-256)
+    {"cmd": "queue", "code": "move(3);"}      -> {"ok": true, "queued": 1, "open": false}
+    {"cmd": "step", "count": 5}               -> one {"step": ...} line per micro-step, then {"done": ...}
+    {"cmd": "run", "max_steps": 1000}         -> same, until the queue is empty or the end is reached
+    {"cmd": "state"}                          -> {"ok": true, "pos": .., "direction": .., "queue": ..}
+    {"cmd": "reset"}                          -> {"ok": true, ...} as for "new", same seed and size
+
+A session can also drive a swarm.Swarm of several rovers on its map, for
+team exercises. "queue" then takes the rover's index, and a step is one
+Swarm.tick() that moves every rover with work left:
+
+    {"cmd": "swarm", "rovers": 4}             -> {"ok": true, "rovers": [[x, y], ...]}
+    {"cmd": "queue", "rover": 2, "code": ..}  -> as above, for rover 2
+    {"cmd": "step"}                           -> {"tick": 1, "statuses": {"0": ..}, "rovers": [..], "docked": [..]}
+
+Step results are streamed with backpressure: after every STREAM_BATCH
+lines the writer is drained, so a slow reader pauses its own session
+instead of filling server memory, and other sessions keep running.
+Requests that fail get {"ok": false, "error": "..."}.
+
+    python server.py serve --port 8765
+    python server.py serve --unix /tmp/rover.sock
+    python server.py client --port 8765 --clients 300   # load test stand-in
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from compiler import LineParser
+from engine import GRID_SIZE, RoverState, generate_grid, micro_steps
+from swarm import Swarm, spawn_points
+
+DEFAULT_PORT = 8765
+MAX_LINE = 1 << 20           # longest request line (a pasted program)
+MAX_STEPS = 100_000          # cap on one run request
+MIN_SIZE, MAX_SIZE = 2, 256  # map sizes a session may ask for; maps are built on the event loop
+MAX_ROVERS = 64              # rovers in one session's swarm
+STREAM_BATCH = 64            # step lines written between drains
+WRITE_HIGH_WATER = 64 * 1024
+
+
+# === SESSIONS ===
+class Session:
+    """One connection's map, rover state and console parser, or its swarm."""
+
+    def __init__(self, seed=None, size=GRID_SIZE):
+        self.new_map(seed, size)
+
+    def new_map(self, seed=None, size=GRID_SIZE):
+        if not MIN_SIZE <= size <= MAX_SIZE:
+            raise ValueError(f"size must be between {MIN_SIZE} and {MAX_SIZE}")
+        self.seed, self.size = seed, size
+        self.grid, self.start, self.end = generate_grid(seed, size)
+        self.state = RoverState.for_grid(self.grid, self.start)
+        self.stepper = micro_steps(self.grid, self.state, self.end)
+        self.parser = LineParser()
+        self.steps = 0
+        self.swarm = None
+        self.parsers = []    # one console parser per swarm rover
+
+    def start_swarm(self, count):
+        """Replace the single rover with count rovers spawned around the start."""
+        if not 1 <= count <= MAX_ROVERS:
+            raise ValueError(f"rovers must be between 1 and {MAX_ROVERS}")
+        starts = spawn_points(self.grid, self.start, count)
+        self.swarm = Swarm(self.grid, starts, self.end)
+        self.parsers = [LineParser() for _ in starts]
+        self.steps = 0
+        return {"ok": True, "rovers": starts}
+
+    def describe(self):
+        return {"ok": True, "grid": ["".join(row) for row in self.grid],
+                "start": self.start, "end": self.end}
+
+    def queue(self, code, rover=None):
+        if self.swarm is None:
+            if rover is not None:
+                raise ValueError("rover given, but this session has no swarm")
+            parser, state = self.parser, self.state
+        else:
+            if not isinstance(rover, int) or not 0 <= rover < len(self.swarm):
+                raise ValueError(f"rover must be an index below {len(self.swarm)}")
+            parser, state = self.parsers[rover], self.swarm.rovers[rover]
+        program = parser.feed(code)
+        if program:
+            state.queue(program)
+        return {"ok": True, "queued": len(program), "open": parser.is_open()}
+
+    def step(self):
+        """One micro-step as a response object, or None when nothing is queued."""
+        swarm = self.swarm
+        if swarm is not None:
+            if not swarm.pending():
+                return None
+            statuses = swarm.tick()
+            self.steps += 1
+            return {"tick": self.steps, "statuses": statuses, "rovers": self.positions(),
+                    "docked": sorted(swarm.docked), "complete": self.complete()}
+        state = self.state
+        if not state.pending():
+            return None
+        status, _ = next(self.stepper)
+        self.steps += 1
+        return {"step": self.steps, "status": status, "pos": state.pos,
+                "direction": state.direction, "complete": self.complete()}
+
+    def positions(self):
+        return [rover.pos for rover in self.swarm.rovers]
+
+    def complete(self):
+        """True once the rover, or every rover of the swarm, reached the end."""
+        if self.swarm is not None:
+            return len(self.swarm.docked) == len(self.swarm)
+        return self.state.pos == self.end
+
+    def queued(self):
+        """Instructions left in the queue (in all rovers' queues for a swarm)."""
+        states = [self.state] if self.swarm is None else self.swarm.rovers
+        return sum(len(state.program) - state.pc for state in states)
+
+    def summary(self):
+        if self.swarm is not None:
+            return {"ok": True, "rovers": self.positions(), "docked": sorted(self.swarm.docked),
+                    "queue": self.queued(), "ticks": self.steps, "complete": self.complete(),
+                    "open": [parser.is_open() for parser in self.parsers]}
+        state = self.state
+        return {"ok": True, "pos": state.pos, "direction": state.direction,
+                "queue": self.queued(), "steps": self.steps,
+                "complete": self.complete(), "open": self.parser.is_open()}
+
+
+# === PROTOCOL ===
+def _send(writer, obj):
+    writer.write(json.dumps(obj, separators=(",", ":")).encode() + b"\n")
+
+
+async def _stream(session, writer, limit):
+    """Run up to limit micro-steps, writing one line each; returns the steps run."""
+    ran = 0
+    while ran < limit:
+        result = session.step()
+        if result is None:
+            break
+        _send(writer, result)
+        ran += 1
+        if result["complete"]:
+            break
+        if ran % STREAM_BATCH == 0:
+            await writer.drain()     # waits only while the client is behind
+            await asyncio.sleep(0)   # and lets the other sessions run
+    _send(writer, {"ok": True, "done": True, "ran": ran, "queue": session.queued(),
+                   "complete": session.complete()})
+    await writer.drain()
+    return ran
+
+
+async def handle(request, session, writer):
+    cmd = request.get("cmd")
+    if cmd == "new":
+        session.new_map(request.get("seed"), int(request.get("size", GRID_SIZE)))
+        _send(writer, session.describe())
+    elif cmd == "reset":
+        session.new_map(session.seed, session.size)
+        _send(writer, session.describe())
+    elif cmd == "queue":
+        _send(writer, session.queue(str(request.get("code", "")), request.get("rover")))
+    elif cmd == "swarm":
+        _send(writer, session.start_swarm(int(request.get("rovers", 2))))
+    elif cmd == "step":
+        await _stream(session, writer, min(int(request.get("count", 1)), MAX_STEPS))
+    elif cmd == "run":
+        await _stream(session, writer, min(int(request.get("max_steps", MAX_STEPS)), MAX_STEPS))
+    elif cmd == "state":
+        _send(writer, session.summary())
+    else:
+        raise ValueError(f"Unknown command {cmd!r}")
+
+
+async def serve_client(reader, writer):
+    writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+    session = Session()
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:   # longer than MAX_LINE
+                _send(writer, {"ok": False, "error": "request line too long"})
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+                await handle(request, session, writer)
+            except (ValueError, TypeError) as e:
+                _send(writer, {"ok": False, "error": str(e)})
+            except ConnectionError:
+                raise
+            except Exception as e:   # a bug in one request must not end the session
+                _send(writer, {"ok": False, "error": f"internal error: {type(e).__name__}: {e}"})
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def start(port=DEFAULT_PORT, host="127.0.0.1", unix=None):
+    if unix:
+        return await asyncio.start_unix_server(serve_client, unix, limit=MAX_LINE)
+    return await asyncio.start_server(serve_client, host, port, limit=MAX_LINE)
+
+
+# === CLIENT STAND-IN ===
+async def _connect(port, host, unix):
+    if unix:
+        return await asyncio.open_unix_connection(unix, limit=MAX_LINE)
+    return await asyncio.open_connection(host, port, limit=MAX_LINE)
+
+
+async def ask(reader, writer, obj):
+    """Send one request and collect its responses up to the last one."""
+    _send(writer, obj)
+    await writer.drain()
+    out = []
+    while True:
+        response = json.loads(await reader.readline())
+        out.append(response)
+        if obj.get("cmd") not in ("step", "run") or "done" in response or not response.get("ok", True):
+            return out
+
+
+async def play(seed, port=DEFAULT_PORT, host="127.0.0.1", unix=None, code=None):
+    """What a browser tab does: new map, queue a program, run it. Returns the final line."""
+    reader, writer = await _connect(port, host, unix)
+    try:
+        await ask(reader, writer, {"cmd": "new", "seed": seed})
+        await ask(reader, writer, {"cmd": "queue", "code": code or
+                                       "repeat(4){ destroy; move(3); turn(90); collect; }"})
+        return (await ask(reader, writer, {"cmd": "run"}))[-1]
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def load_test(clients, port=DEFAULT_PORT, host="127.0.0.1", unix=None):
+    began = time.perf_counter()
+    results = await asyncio.gather(*(play(seed, port, host, unix) for seed in range(clients)))
+    seconds = time.perf_counter() - began
+    steps = sum(r["ran"] for r in results)
+    print(f"{clients} sessions, {steps} steps in {seconds:.2f} s "
+          f"({steps / seconds:.0f} steps/s)", file=sys.stderr)
+    return results
+
+
+# === COMMAND LINE ===
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve rover sessions as JSON Lines")
+    parser.add_argument("mode", choices=("serve", "client"), help="run the server or the load-test client")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="use a Unix socket instead of TCP")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent sessions (client mode)")
+    return parser.parse_args(argv)
+
+
+async def _serve_forever(args):
+    server = await start(args.port, args.host, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"serving rover sessions on {where}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        if args.mode == "serve":
+            asyncio.run(_serve_forever(args))
+        else:
+            asyncio.run(load_test(args.clients, args.port, args.host, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
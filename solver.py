@@ -0,0 +1,225 @@
+"""Optimal-solution search for generated maps under the step_execution rules.
+
+The solver finds the program with the fewest tiles moved that takes the
+rover from start to E, and among those the one with the fewest
+instructions (a move(n) counts once). Gas must be destroyed from the tile
+in front before moving into it; items can be walked over, and only need
+collecting when require_items is set.
+
+The search is A* ordered by (moves + tiles left, instructions), where
+tiles left is a breadth-first distance to E, or via the farthest item
+still to collect, over every tile that is not blocked. It never
+overestimates, so only states on move-optimal routes get expanded.
+
+A search state is one integer: heading in the low 2 bits, the tile index
+above that, then a bitmask with one bit per gas tile (destroyed) and per
+item tile (collected). States are settled in a hash set. A state is also
+skipped when a state on the same tile and heading, settled at no higher
+cost, already has a superset of its bits, because destroying more gas or
+holding more items never hurts.
+"""
+import heapq
+from collections import deque
+
+from engine import TILE_BLOCKED, TILE_END, TILE_GAS, TILE_ITEM, encode_grid
+
+# Heading index -> (dx, dy) in the engine's 0/90/180/270 degree order
+_STEPS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+_TURNS = ((1, "turn(90);"), (2, "turn(180);"), (3, "turn(270);"))
+
+# Difficulty bands by optimal program length (instructions)
+EASY_MAX_LENGTH = 20    # about the easiest 10% of 14x14 maps
+HARD_MIN_LENGTH = 35    # about the hardest 10%
+
+# Cost is moves in the high bits, instructions in the low bits
+_INSTR_BITS = 32
+
+
+class Solution:
+    """Optimal program for a map: code lines, tiles moved and instruction count."""
+
+    def __init__(self, program, moves):
+        self.program = program
+        self.moves = moves
+
+    def __len__(self):
+        return len(self.program)
+
+    def __repr__(self):
+        return f"Solution(moves={self.moves}, length={len(self.program)})"
+
+
+def _tiles(grid):
+    """Flat tile codes and width for a grid of characters or a 2-D uint8 array."""
+    if hasattr(grid, "tobytes"):
+        return grid.tobytes(), grid.shape[1]
+    return encode_grid(grid), len(grid[0])
+
+
+def solve(grid, start, end, require_items=False):
+    """Return the optimal Solution for a map, or None when E cannot be reached."""
+    tiles, width = _tiles(grid)
+    height = len(tiles) // width
+    goal = end[1] * width + end[0]
+    origin = start[1] * width + start[0]
+    if tiles[goal] != TILE_END:
+        return None
+
+    # One flag bit per gas tile, then per item tile when items count
+    gas = [i for i, t in enumerate(tiles) if t == TILE_GAS]
+    items = [i for i, t in enumerate(tiles) if t == TILE_ITEM] if require_items else []
+    bit = {cell: 1 << n for n, cell in enumerate(gas + items)}
+    item_bits = sum(bit[i] for i in items)
+
+    dist = _distances_to(tiles, width, height, goal)
+    to_item = {i: _distances_to(tiles, width, height, i) for i in items}
+    bound = _route_bound(origin, dist, to_item)
+    if bound is None:
+        return None
+    # Gas behind the rover that no route within bound can re-enter is
+    # forgotten, which keeps the masks of different routes comparable.
+    to_gas = [(bit[g], _distances_to(tiles, width, height, g), dist[g]) for g in gas]
+
+    def estimate(cell, flags):
+        h = dist[cell]
+        for i in items:
+            if not flags & bit[i] and to_item[i][cell] + dist[i] > h:
+                h = to_item[i][cell] + dist[i]
+        return h << _INSTR_BITS
+
+    def relevant(cell, flags, moves):
+        for b, to_cell, onward in to_gas:
+            if flags & b and moves + to_cell[cell] + onward > bound:
+                flags &= ~b
+        return flags
+
+    shift = (width * height).bit_length() + 2
+    low = (1 << shift) - 1
+    first = origin << 2
+    heap = [(estimate(origin, 0), 0, first)]
+    best = {first: 0}
+    parent = {first: None}
+    settled = set()
+    kept = {}   # (tile << 2 | heading) -> flag masks settled there
+
+    def push(prev, cell, heading, flags, cost, action):
+        flags = relevant(cell, flags, cost >> _INSTR_BITS)
+        state = flags << shift | cell << 2 | heading
+        if cost < best.get(state, cost + 1):
+            best[state] = cost
+            parent[state] = (prev, action)
+            heapq.heappush(heap, (cost + estimate(cell, flags), cost, state))
+
+    while heap:
+        _, cost, state = heapq.heappop(heap)
+        if state in settled:
+            continue
+        key = state & low
+        flags = state >> shift
+        masks = kept.setdefault(key, [])
+        if any(flags & ~m == 0 for m in masks):
+            continue
+        settled.add(state)
+        masks.append(flags)
+
+        cell = key >> 2
+        heading = key & 3
+        if cell == goal and flags & item_bits == item_bits:
+            return _rebuild(state, parent, cost >> _INSTR_BITS)
+
+        for turn, action in _TURNS:
+            push(state, cell, (heading + turn) & 3, flags, cost + 1, action)
+
+        x, y = cell % width, cell // width
+        dx, dy = _STEPS[heading]
+
+        # destroy; only matters for gas still standing right ahead
+        ax, ay = x + dx, y + dy
+        if 0 <= ax < width and 0 <= ay < height:
+            ahead = ay * width + ax
+            if tiles[ahead] == TILE_GAS and not flags & bit[ahead]:
+                push(state, cell, heading, flags | bit[ahead], cost + 1, "destroy;")
+
+        # collect; only matters for items still lying underfoot
+        if tiles[cell] == TILE_ITEM and cell in bit and not flags & bit[cell]:
+            push(state, cell, heading, flags | bit[cell], cost + 1, "collect;")
+
+        # move(k) for every reachable distance k along the heading
+        k = 0
+        while True:
+            x, y = x + dx, y + dy
+            if not (0 <= x < width and 0 <= y < height):
+                break
+            nxt = y * width + x
+            t = tiles[nxt]
+            if t == TILE_BLOCKED or t == TILE_GAS and not flags & bit[nxt]:
+                break
+            k += 1
+            push(state, nxt, heading, flags, cost + (k << _INSTR_BITS) + 1, f"move({k});")
+            if nxt == goal and flags & item_bits == item_bits:
+                break   # the rover stops on E
+    return None
+
+
+def _route_bound(origin, dist, to_item):
+    """Length of a greedy nearest-item tour ending on E: an upper bound on the optimum."""
+    if dist[origin] < 0:
+        return None
+    total = 0
+    here = origin
+    left = set(to_item)
+    while left:
+        nearest = min(left, key=lambda i: to_item[i][here])
+        if to_item[nearest][here] < 0:
+            return None
+        total += to_item[nearest][here]
+        here = nearest
+        left.remove(nearest)
+    return total + dist[here]
+
+
+def _distances_to(tiles, width, height, goal):
+    """Fewest tiles from each tile to goal, ignoring gas; -1 where unreachable."""
+    dist = [-1] * (width * height)
+    dist[goal] = 0
+    queue = deque([goal])
+    while queue:
+        cell = queue.popleft()
+        x, y = cell % width, cell // width
+        for dx, dy in _STEPS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                nxt = ny * width + nx
+                if dist[nxt] < 0 and tiles[nxt] != TILE_BLOCKED:
+                    dist[nxt] = dist[cell] + 1
+                    queue.append(nxt)
+    return dist
+
+
+def _rebuild(state, parent, moves):
+    program = []
+    while parent[state] is not None:
+        state, action = parent[state]
+        program.append(action)
+    program.reverse()
+    return Solution(program, moves)
+
+
+DIFFICULTIES = ("easy", "normal", "hard")
+
+
+def rate_length(length):
+    """'easy', 'normal' or 'hard' for an optimal program of length instructions."""
+    if length <= EASY_MAX_LENGTH:
+        return "easy"
+    if length >= HARD_MIN_LENGTH:
+        return "hard"
+    return "normal"
+
+
+def rate_map(grid, start, end, require_items=False):
+    """Classify a map as 'unsolvable', 'easy', 'normal' or 'hard' by its optimal program length."""
+    solution = solve(grid, start, end, require_items)
+    if solution is None:
+        return "unsolvable"
+    return rate_length(len(solution))
@@ -0,0 +1,119 @@
+"""Several rovers on one grid, for team and swarm exercises.
+
+Each rover is a RoverState with its own program queue; destroyed gas and
+collected items belong to the Swarm and are shared, so gas one rover
+destroys is cleared for all of them. A tick gives every rover one
+step_execution micro-step, in rover order, so runs are deterministic.
+
+Collisions are checked against an occupancy index, a hash of tile ->
+rover, so a move costs one lookup however many rovers there are. A rover
+whose next step would enter an occupied tile stops its move there, the
+way it stops in front of a blocked tile. A rover that reaches the end
+docks: it leaves the occupancy index and runs no further steps.
+
+server.py's "swarm" command runs a Swarm in a session.
+"""
+from collections import deque
+
+from compiler import OP_MOVE
+from engine import RoverState, move, step_execution
+from runindex import STEPS
+
+OPEN_TILES = frozenset(".S")   # tiles rovers can be spawned on
+
+
+def spawn_points(grid, start, count):
+    """count distinct open tiles closest to start (breadth-first), start first.
+
+    The search goes around blocked tiles but through gas and items.
+    """
+    height, width = len(grid), len(grid[0])
+    seen = {start}
+    order = deque([start])
+    points = []
+    while order and len(points) < count:
+        x, y = order.popleft()
+        if grid[y][x] in OPEN_TILES:
+            points.append((x, y))
+        for dx, dy in STEPS.values():
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and (nx, ny) not in seen \
+                    and grid[ny][nx] != "X":
+                seen.add((nx, ny))
+                order.append((nx, ny))
+    if len(points) < count:
+        raise ValueError(f"Only {len(points)} open tiles reachable from {start}")
+    return points
+
+
+class Swarm:
+    """K rovers sharing a grid, its gas and item progress and an occupancy index."""
+
+    def __init__(self, grid, starts, end=None, direction=0):
+        self.grid = grid
+        self.end = end
+        # no visited bits per rover: the swarm never reads them and they are map-sized
+        self.rovers = [RoverState.for_grid(grid, pos, direction, track_visits=False) for pos in starts]
+        self.occupancy = {}    # (x, y) -> index of the rover on that tile
+        for i, pos in enumerate(starts):
+            if pos in self.occupancy:
+                raise ValueError(f"Rovers {self.occupancy[pos]} and {i} both start on {pos}")
+            self.occupancy[pos] = i
+        self.destroyed = 0     # shared progress bitsets, as in RoverState
+        self.collected = 0
+        self.docked = set()    # rovers that reached the end
+        self.ticks = 0
+
+    def __len__(self):
+        return len(self.rovers)
+
+    def queue(self, i, program):
+        self.rovers[i].queue(program)
+
+    def occupant(self, pos):
+        """Index of the rover on pos, or None."""
+        return self.occupancy.get(pos)
+
+    def pending(self):
+        """True while an undocked rover has instructions left."""
+        docked = self.docked
+        return any(r.pending() for i, r in enumerate(self.rovers) if i not in docked)
+
+    def step(self, i):
+        """One micro-step of rover i; returns (status, finished) like step_execution."""
+        rover = self.rovers[i]
+        if i in self.docked:
+            return "Docked at the end.", True
+        if rover.move_remaining > 0:
+            op, _ = rover.fetch()
+            if op == OP_MOVE:
+                other = self.occupancy.get(move(rover.pos, rover.direction, 1))
+                if other is not None and other != i:   # off-axis headings stay put
+                    rover.move_remaining = 0
+                    rover.pc += 1
+                    return f"Blocked by rover {other}!", True
+        before = rover.pos
+        rover.destroyed, rover.collected = self.destroyed, self.collected
+        status, finished = step_execution(self.grid, rover, trace=False)
+        self.destroyed, self.collected = rover.destroyed, rover.collected
+        pos = rover.pos
+        if pos != before:
+            del self.occupancy[before]
+            if pos == self.end:
+                self.docked.add(i)
+                return "Reached the end - docked.", True
+            self.occupancy[pos] = i
+        return status, finished
+
+    def tick(self):
+        """Advance every rover with queued work by one micro-step, in rover order.
+
+        Returns {rover index: status} for the rovers that ran.
+        """
+        self.ticks += 1
+        docked = self.docked
+        statuses = {}
+        for i, rover in enumerate(self.rovers):
+            if i not in docked and rover.pending():
+                statuses[i] = self.step(i)[0]
+        return statuses
@@ -1,14 +1,36 @@
+import time
+IMPORT_STARTED = time.perf_counter()   # before pygame, so --startup-report includes its import
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
 import pygame
 import sys
-import random
-from collections import deque
+from functools import lru_cache
+
+from chunks import generate_chunked_grid
+from compiler import LineParser
+from engine import (
+    GRID_SIZE, OUTCOME_MESSAGES, SUCCESS, TICK_LIMIT, RoverState, generate_grid, micro_steps,
+)
+from perf import CsvDump, Profiler
+from replay import TraceRecorder
+from scheduler import Scheduler
 
 # === GAME SETTINGS ===
-GRID_SIZE = 14   # grid size
-TILE_SIZE = 36   # tile size
+TILE_SIZE = 36   # tile size at the default zoom
+VIEW_TILES = GRID_SIZE   # tiles across the grid viewport at the default zoom
+GRID_PX = VIEW_TILES * TILE_SIZE   # grid viewport size in pixels
+GRID_X, GRID_Y = 20, 50            # top-left of the grid viewport
 RIGHT_PANEL_WIDTH = 320
-WIDTH = GRID_SIZE * TILE_SIZE + RIGHT_PANEL_WIDTH
-HEIGHT = GRID_SIZE * TILE_SIZE + 280  # taller window
+WIDTH = GRID_PX + RIGHT_PANEL_WIDTH
+HEIGHT = GRID_PX + 280  # taller window
+
+MAP_SIZE = GRID_SIZE     # tiles per side of the map (--size)
+MAP_SEED = None          # fixed map seed (--seed); None = new map on every Reset
+CHUNKED_MIN_SIZE = 128   # maps this big or bigger use chunked storage
 
 # Colors
 WHITE = (240, 240, 240)
@@ -22,12 +44,103 @@ DARKGREEN = (0, 150, 0)   # Toxic gas
 LIGHTGRAY = (230, 230, 230)
 LIGHTBLUE = (173, 216, 230)
 
-pygame.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Rover Pathway - Hard Mode (REPL)")
+# === STARTUP ===
+# Nothing touches SDL at import: the window opens with the first frame and
+# each font loads the first time it is used. Which file SysFont picks for
+# a font (a scan of every installed font) and the wrapped panel text are
+# kept in STARTUP_CACHE, so later runs skip both.
+STARTUP_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "rover-pathway", "startup.json")
+STARTUP_CACHE_VERSION = 1
+PANEL_TEXT_WIDTH = RIGHT_PANEL_WIDTH - 80
+
+screen = None
 clock = pygame.time.Clock()
-font = pygame.font.SysFont("Arial", 18)
-big_font = pygame.font.SysFont("Arial", 24, bold=True)
+startup_times = {}       # phase -> seconds, for --startup-report
+startup_cache = None     # {"fonts": {...}, "wrapped": {...}}, loaded on first use
+startup_cache_dirty = False
+
+def add_startup_time(phase, began):
+    startup_times[phase] = startup_times.get(phase, 0) + time.perf_counter() - began
+
+def format_startup_report(cold):
+    """One line of startup phase times; cold means the startup cache had to be filled."""
+    phases = ", ".join(f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in startup_times.items())
+    return f"startup: {phases} (startup cache {'miss' if cold else 'hit'})"
+
+def init_display():
+    """Open the window; draw_grid calls this on the first frame."""
+    global screen
+    began = time.perf_counter()
+    pygame.display.init()   # not pygame.init(): the game has no sound or joysticks
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Rover Pathway - Hard Mode (REPL)")
+    add_startup_time("display", began)
+
+def load_startup_cache():
+    global startup_cache
+    if startup_cache is None:
+        try:
+            with open(STARTUP_CACHE) as f:
+                startup_cache = json.load(f)
+            if startup_cache.get("version") != [STARTUP_CACHE_VERSION, pygame.version.ver]:
+                raise ValueError("stale startup cache")
+        except (OSError, ValueError, AttributeError):
+            startup_cache = {"version": [STARTUP_CACHE_VERSION, pygame.version.ver],
+                             "fonts": {}, "wrapped": {}}
+    return startup_cache
+
+def save_startup_cache():
+    """Write the startup cache if this run added to it; failures only cost the next start."""
+    global startup_cache_dirty
+    if not startup_cache_dirty:
+        return
+    try:
+        os.makedirs(os.path.dirname(STARTUP_CACHE), exist_ok=True)
+        with open(STARTUP_CACHE + ".tmp", "w") as f:
+            json.dump(startup_cache, f)
+        os.replace(STARTUP_CACHE + ".tmp", STARTUP_CACHE)
+    except OSError:
+        pass
+    startup_cache_dirty = False
+
+def font_file(name, bold=False):
+    """[path, fake_bold] of the font SysFont(name, bold=bold) would load; path None is pygame's own."""
+    global startup_cache_dirty
+    fonts = load_startup_cache()["fonts"]
+    key = f"{name}|{int(bold)}"
+    found = fonts.get(key)
+    if found is None or (found[0] is not None and not os.path.exists(found[0])):
+        def record(path, size, fake_bold, fake_italic):
+            found[:] = [path, fake_bold]
+        found = []
+        pygame.font.SysFont(name, 1, bold, constructor=record)
+        fonts[key] = found
+        startup_cache_dirty = True
+    return found
+
+class LazyFont:
+    """Stands in for pygame.font.SysFont(name, size, bold) and loads it on first use."""
+
+    def __init__(self, name, size, bold=False):
+        self.spec = (name, size, bold)
+        self.font = None
+
+    def __getattr__(self, attr):
+        if self.font is None:
+            began = time.perf_counter()
+            if not pygame.font.get_init():
+                pygame.font.init()
+            name, size, bold = self.spec
+            path, fake_bold = font_file(name, bold)
+            self.font = pygame.font.Font(path, size)
+            if fake_bold:
+                self.font.set_bold(True)
+            add_startup_time("fonts", began)
+        return getattr(self.font, attr)
+
+font = LazyFont("Arial", 18)
+big_font = LazyFont("Arial", 24, bold=True)
+hud_font = LazyFont("Courier New", 14)
 
 # === TEXT CONTENT ===
 INTRO_TEXT = (
@@ -52,6 +165,14 @@ INSTRUCTIONS_TEXT = (
     "  - Items (I) must be collected with collect; while standing on them.\n"
     "  - Use repeat to avoid long sequences. Example:\n"
     "      repeat(2){ destroy; move(1); }\n"
+    "  - A repeat block can span several lines; the prompt shows ... until it is closed.\n"
+    "  - Ctrl+V pastes a whole program at once.\n\n"
+    "Map view:\n"
+    "  mouse wheel over map  => zoom in/out\n"
+    "  right-drag, Ctrl+arrows => pan\n"
+    "  F2                    => follow the rover on/off\n"
+    "  F3                    => save a replay trace of this map\n"
+    "  F4                    => performance overlay on/off\n"
 )
 
 # === TEXT WRAPPING (supports explicit newlines) ===
@@ -75,133 +196,185 @@ def wrap_text_multiline(text, font, max_width):
             out_lines.append(current_line)
     return out_lines
 
-# Pre-wrap the text
-INTRO_LINES = wrap_text_multiline(INTRO_TEXT, font, RIGHT_PANEL_WIDTH - 80)
-INSTRUCTION_LINES = wrap_text_multiline(INSTRUCTIONS_TEXT, font, RIGHT_PANEL_WIDTH - 80)
-
-# === EXECUTION / PARSING STATE (REPL) ===
-action_queue = deque()     # queue of pending instructions (strings like 'move(3);')
-current_move_remaining = 0
-collected_items_global = set()
-destroyed_gases_global = set()
+@lru_cache(maxsize=None)
+def panel_lines(text):
+    """text wrapped to the side panels in `font`, from the startup cache when it has it."""
+    global startup_cache_dirty
+    began = time.perf_counter()
+    name, size, bold = font.spec
+    path = font_file(name, bold)[0]
+    digest = hashlib.sha1(text.encode()).hexdigest()[:16]
+    key = f"{path}|{size}|{PANEL_TEXT_WIDTH}|{digest}"
+    wrapped = load_startup_cache()["wrapped"]
+    if key not in wrapped:
+        wrapped[key] = wrap_text_multiline(text, font, PANEL_TEXT_WIDTH)
+        startup_cache_dirty = True
+    add_startup_time("wrap", began)
+    return wrapped[key]
+
+# === TEXT CACHE ===
+TEXT_CACHE_SIZE = 512   # rendered surfaces kept; least recently used go first
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(font, text, color):
+    """font.render(text, True, color), cached by (font, text, color)."""
+    return font.render(text, True, color)
+
+# === EXECUTION STATE (UI) ===
 status_message = ""
 
-# === GRID GENERATION ===
-def generate_grid():
-    grid = [["." for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-    start = (0, 0)
-    end = (GRID_SIZE-1, GRID_SIZE-1)
-    grid[start[1]][start[0]] = "S"
-    grid[end[1]][end[0]] = "E"
-
-    # Create a guaranteed path
-    path = [start]
-    x, y = start
-    while (x, y) != end:
-        if x < GRID_SIZE - 1 and y < GRID_SIZE - 1:
-            if random.choice([True, False]):
-                x += 1
-            else:
-                y += 1
-        elif x < GRID_SIZE - 1:
-            x += 1
-        elif y < GRID_SIZE - 1:
-            y += 1
-        path.append((x, y))
-
-    # Place challenges on path
-    for px, py in path[1:-1]:
-        choice = random.choices(
-            [".", "G", "I"],
-            weights=[0.3, 0.5, 0.2]  # more toxic gas
-        )[0]
-        grid[py][px] = choice
-
-    # Fill rest with blocked tiles randomly
-    for j in range(GRID_SIZE):
-        for i in range(GRID_SIZE):
-            if (i, j) not in path and grid[j][i] == ".":
-                if random.random() < 0.45:
-                    grid[j][i] = "X"
-
-    return grid, start, end
-
 # === BUTTONS ===
-def draw_button(text, x, y, w, h):
+def draw_button(text, x, y, w, h, surface=None):
+    surface = surface or screen
     rect = pygame.Rect(x, y, w, h)
-    pygame.draw.rect(screen, GRAY, rect)
-    pygame.draw.rect(screen, BLACK, rect, 2)
-    label = big_font.render(text, True, BLACK)
-    screen.blit(label, (x + (w - label.get_width()) // 2, y + (h - label.get_height()) // 2))
+    pygame.draw.rect(surface, GRAY, rect)
+    pygame.draw.rect(surface, BLACK, rect, 2)
+    label = render_text(big_font, text, BLACK)
+    surface.blit(label, (x + (w - label.get_width()) // 2, y + (h - label.get_height()) // 2))
     return rect
 
-def draw_panel(title, lines, rect, scroll_offset):
-    pygame.draw.rect(screen, LIGHTGRAY, rect)
-    pygame.draw.rect(screen, BLACK, rect, 2)
-    screen.blit(big_font.render(title, True, BLACK), (rect.x + 10, rect.y + 5))
-
+def clamp_panel_scroll(lines, rect, scroll_offset):
     line_height = 22
     visible_height = rect.height - 40
     text_height = len(lines) * line_height
-
-    # Clamp scrolling
     min_scroll = min(0, visible_height - text_height)
-    scroll_offset = max(min_scroll, min(0, scroll_offset))
+    return max(min_scroll, min(0, scroll_offset))
+
+def draw_panel(title, lines, rect, scroll_offset, surface=None):
+    surface = surface or screen
+    pygame.draw.rect(surface, LIGHTGRAY, rect)
+    pygame.draw.rect(surface, BLACK, rect, 2)
+    surface.blit(render_text(big_font, title, BLACK), (rect.x + 10, rect.y + 5))
+
+    line_height = 22
+    scroll_offset = clamp_panel_scroll(lines, rect, scroll_offset)
 
     y_start = rect.y + 35 + scroll_offset
     for i, line in enumerate(lines):
         if rect.y + 30 <= y_start + i * line_height <= rect.y + rect.height - 20:
-            label = font.render(line, True, BLACK)
-            screen.blit(label, (rect.x + 10, y_start + i * line_height))
+            label = render_text(font, line, BLACK)
+            surface.blit(label, (rect.x + 10, y_start + i * line_height))
 
     return scroll_offset
 
-# === GRID RENDERING ===
-def draw_grid(grid, rover, code_lines, current_input, message, visited,
-              intro_scroll, instr_scroll, scroll_offset, rover_direction):
-    screen.fill(WHITE)
-
-    # Title
-    title = big_font.render("Rover Pathway - Hard Mode", True, BLACK)
-    screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 10))
-
-    # Center grid
-    grid_x = 20
-    grid_y = 50
-    for j in range(GRID_SIZE):
-        for i in range(GRID_SIZE):
-            rect = pygame.Rect(grid_x + i * TILE_SIZE, grid_y + j * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-            tile = grid[j][i]
-
-            if (i, j) in visited:
-                pygame.draw.rect(screen, LIGHTBLUE, rect)
-
-            # Check if gas has been destroyed
-            if tile == "G" and (i, j) in destroyed_gases_global:
-                pygame.draw.rect(screen, LIGHTGRAY, rect)
-            elif tile == "S":
-                pygame.draw.rect(screen, GREEN, rect)
-            elif tile == "E":
-                pygame.draw.rect(screen, RED, rect)
-            elif tile == "X":
-                pygame.draw.rect(screen, GRAY, rect)
-            elif tile == "G":
-                pygame.draw.rect(screen, DARKGREEN, rect)
-            elif tile == "I" and (i, j) not in collected_items_global:
-                pygame.draw.rect(screen, YELLOW, rect)
-            elif tile == "I" and (i, j) in collected_items_global:
-                pygame.draw.rect(screen, LIGHTGRAY, rect)
-
-            pygame.draw.rect(screen, BLACK, rect, 1)
-
-    # Rover with direction indicator
-    rover_rect = pygame.Rect(grid_x + rover[0] * TILE_SIZE, grid_y + rover[1] * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-    pygame.draw.rect(screen, BLUE, rover_rect)
+# === CAMERA ===
+ZOOM_LEVELS = (9, 12, 18, 24, 36, 48, 72)   # tile sizes in pixels
+camera_x, camera_y = 0, 0   # map tile shown at the top-left of the viewport
+tile_px = TILE_SIZE
+follow_rover = True
+
+def view_tiles():
+    """Whole tiles across the viewport at the current zoom."""
+    return GRID_PX // tile_px
+
+def clamp_camera(size):
+    global camera_x, camera_y
+    limit = max(0, size - view_tiles())
+    camera_x = max(0, min(camera_x, limit))
+    camera_y = max(0, min(camera_y, limit))
+
+def center_camera(pos, size):
+    global camera_x, camera_y
+    half = view_tiles() // 2
+    camera_x, camera_y = pos[0] - half, pos[1] - half
+    clamp_camera(size)
+
+def pan_camera(dx, dy, size):
+    """Move the viewport by whole tiles; panning stops following the rover."""
+    global camera_x, camera_y, follow_rover
+    follow_rover = False
+    camera_x += dx
+    camera_y += dy
+    clamp_camera(size)
+
+def zoom_camera(step, size, anchor=None):
+    """Step through ZOOM_LEVELS, keeping the anchor tile (default: view centre) in place."""
+    global tile_px, camera_x, camera_y
+    level = max(0, min(len(ZOOM_LEVELS) - 1, ZOOM_LEVELS.index(tile_px) + step))
+    if anchor is None:
+        anchor = (camera_x + view_tiles() // 2, camera_y + view_tiles() // 2)
+    slot_x = (anchor[0] - camera_x) * tile_px
+    slot_y = (anchor[1] - camera_y) * tile_px
+    tile_px = ZOOM_LEVELS[level]
+    camera_x = anchor[0] - slot_x // tile_px
+    camera_y = anchor[1] - slot_y // tile_px
+    clamp_camera(size)
+
+def screen_to_tile(mx, my, size):
+    """Map tile under a window position, or None outside the visible grid."""
+    n = min(view_tiles(), size)
+    if GRID_X <= mx < GRID_X + n * tile_px and GRID_Y <= my < GRID_Y + n * tile_px:
+        return camera_x + (mx - GRID_X) // tile_px, camera_y + (my - GRID_Y) // tile_px
+    return None
+
+# === RENDER CACHE ===
+# The frame is composed on an offscreen `scene` surface; tiles come from
+# `tile_layer`, where each tile is only repainted when its state changes.
+# Every region remembers what it last showed, so a frame redraws only the
+# regions that changed and pushes just those rects with display.update().
+scene = None
+tile_layer = None      # the viewport's tiles, one slot per visible tile
+tile_states = {}       # viewport slot -> (i, j, tile, visited, cleared) last painted
+region_keys = {}       # region name -> what it last showed
+last_rover = None      # (pos, direction) last drawn
+last_tooltip_rect = None
+
+# === PERFORMANCE HUD ===
+# draw_grid and the main loop report their phases to `profiler`; other
+# code can watch frames with profiler.add_hook(fn), fn(FrameStats).
+profiler = Profiler()
+show_hud = False
+hud_lines = ()           # overlay text, refreshed every HUD_REFRESH_MS
+HUD_REFRESH_MS = 250
+HUD_WIDTH = 250
+last_hud_rect = None
+
+def format_hud(summary):
+    """Overlay lines for a Profiler.summary()."""
+    if summary is None:
+        return ()
+    ms = summary["phases"]
+    return (
+        f"{summary['fps']:5.1f} fps  frame {summary['frame_ms']:6.2f} ms",
+        f"events {ms.get('events', 0):5.2f}  sim {ms.get('simulation', 0):6.2f}",
+        f"tiles {ms.get('tiles', 0):6.2f}  panels {ms.get('panels', 0):5.2f}",
+        f"flip {ms.get('flip', 0):6.2f}  idle {ms.get('idle', 0):6.2f}",
+        f"queue {summary['gauges'].get('queue', 0)}  steps/s {summary['per_second'].get('steps', 0):.0f}",
+    )
+
+def invalidate_frame():
+    """Force the next draw_grid call to repaint and flip the whole window."""
+    global scene
+    scene = None
+
+def paint_tile(surface, rect, tile, visited, cleared):
+    surface.fill(WHITE, rect)
+    if visited:
+        pygame.draw.rect(surface, LIGHTBLUE, rect)
+
+    # Destroyed gas and collected items show as cleared
+    if cleared:
+        pygame.draw.rect(surface, LIGHTGRAY, rect)
+    elif tile == "S":
+        pygame.draw.rect(surface, GREEN, rect)
+    elif tile == "E":
+        pygame.draw.rect(surface, RED, rect)
+    elif tile == "X":
+        pygame.draw.rect(surface, GRAY, rect)
+    elif tile == "G":
+        pygame.draw.rect(surface, DARKGREEN, rect)
+    elif tile == "I":
+        pygame.draw.rect(surface, YELLOW, rect)
+
+    pygame.draw.rect(surface, BLACK, rect, 1)
+
+def paint_rover(surface, rover_rect, rover_direction):
+    pygame.draw.rect(surface, BLUE, rover_rect)
 
     # Draw direction arrow on rover
     center_x = rover_rect.centerx
     center_y = rover_rect.centery
-    arrow_length = TILE_SIZE // 3
+    arrow_length = rover_rect.width // 3
 
     if rover_direction == 0:      # Right
         end_x, end_y = center_x + arrow_length, center_y
@@ -214,32 +387,117 @@ def draw_grid(grid, rover, code_lines, current_input, message, visited,
     else:                         # Default to right
         end_x, end_y = center_x + arrow_length, center_y
 
-    pygame.draw.line(screen, WHITE, (center_x, center_y), (end_x, end_y), 3)
+    pygame.draw.line(surface, WHITE, (center_x, center_y), (end_x, end_y), 3)
+
+def region_changed(name, key):
+    if region_keys.get(name) == key:
+        return False
+    region_keys[name] = key
+    return True
+
+# === GRID RENDERING ===
+def draw_grid(grid, state, code_lines, current_input, message,
+              intro_scroll, instr_scroll, scroll_offset, speed_label="1x", prompt="> "):
+    global scene, tile_layer, last_rover, last_tooltip_rect, last_hud_rect
+    rover, rover_direction = state.pos, state.direction
+    dirty = []
+    full = scene is None
+    if full:
+        if screen is None:
+            init_display()
+        scene = pygame.Surface((WIDTH, HEIGHT))
+        tile_layer = pygame.Surface((GRID_PX, GRID_PX))
+        region_keys.clear()
+        last_rover = None
+        scene.fill(WHITE)
+
+        # Title
+        title = render_text(big_font, "Rover Pathway - Hard Mode", BLACK)
+        scene.blit(title, (WIDTH // 2 - title.get_width() // 2, 10))
+
+    # Visible part of the grid
+    size = len(grid)
+    if follow_rover:
+        n = view_tiles()
+        if not (camera_x <= rover[0] < camera_x + n and camera_y <= rover[1] < camera_y + n):
+            center_camera(rover, size)
+    clamp_camera(size)
+    n = min(view_tiles(), size)
+    px = tile_px
+    view_rect = pygame.Rect(GRID_X, GRID_Y, GRID_PX, GRID_PX)
+    if region_changed("view", (px, size)):
+        tile_layer.fill(WHITE)
+        tile_states.clear()
+        scene.fill(WHITE, view_rect)
+        dirty.append(view_rect)
+
+    changed_slots = []
+    for sj in range(n):
+        j = camera_y + sj
+        row = grid[j]
+        for si in range(n):
+            i = camera_x + si
+            tile = row[i]
+            cleared = ((tile == "G" and state.is_destroyed((i, j)))
+                       or (tile == "I" and state.is_collected((i, j))))
+            shown = (i, j, tile, state.has_visited((i, j)), cleared)
+            if tile_states.get((si, sj)) != shown:
+                tile_states[(si, sj)] = shown
+                paint_tile(tile_layer, pygame.Rect(si * px, sj * px, px, px), tile, shown[3], cleared)
+                changed_slots.append((si, sj))
+
+    # Rover with direction indicator
+    if last_rover != (rover, rover_direction):
+        if last_rover is not None:
+            changed_slots.append((last_rover[0][0] - camera_x, last_rover[0][1] - camera_y))
+        changed_slots.append((rover[0] - camera_x, rover[1] - camera_y))
+        last_rover = (rover, rover_direction)
+
+    for si, sj in changed_slots:
+        if 0 <= si < n and 0 <= sj < n:
+            rect = pygame.Rect(GRID_X + si * px, GRID_Y + sj * px, px, px)
+            scene.blit(tile_layer, rect, pygame.Rect(si * px, sj * px, px, px))
+            if (camera_x + si, camera_y + sj) == rover:
+                paint_rover(scene, rect, rover_direction)
+            if len(changed_slots) <= 64:
+                dirty.append(rect)
+    if len(changed_slots) > 64:
+        dirty.append(view_rect)
+    profiler.lap("tiles")
 
     # Panels
-    intro_rect = pygame.Rect(GRID_SIZE * TILE_SIZE + 40, 50, RIGHT_PANEL_WIDTH - 60, 160)
-    instr_rect = pygame.Rect(GRID_SIZE * TILE_SIZE + 40, 220, RIGHT_PANEL_WIDTH - 60, 200)
-    intro_scroll = draw_panel("Mission Story", INTRO_LINES, intro_rect, intro_scroll)
-    instr_scroll = draw_panel("Instructions", INSTRUCTION_LINES, instr_rect, instr_scroll)
+    intro_rect = pygame.Rect(GRID_PX + 40, 50, RIGHT_PANEL_WIDTH - 60, 160)
+    instr_rect = pygame.Rect(GRID_PX + 40, 220, RIGHT_PANEL_WIDTH - 60, 200)
+    intro_lines, instruction_lines = panel_lines(INTRO_TEXT), panel_lines(INSTRUCTIONS_TEXT)
+    intro_scroll = clamp_panel_scroll(intro_lines, intro_rect, intro_scroll)
+    instr_scroll = clamp_panel_scroll(instruction_lines, instr_rect, instr_scroll)
+    for name, title, lines, rect, scroll in (("intro", "Mission Story", intro_lines, intro_rect, intro_scroll),
+                                             ("instr", "Instructions", instruction_lines, instr_rect, instr_scroll)):
+        if region_changed(name, scroll):
+            scene.set_clip(rect)
+            draw_panel(title, lines, rect, scroll, scene)
+            scene.set_clip(None)
+            dirty.append(rect)
 
     # Status counters
-    stats_x = GRID_SIZE * TILE_SIZE + 40
+    stats_x = GRID_PX + 40
     stats_y = instr_rect.bottom + 10
-    screen.blit(big_font.render("Status", True, BLACK), (stats_x, stats_y))
-    screen.blit(font.render(f"Collected: {len(collected_items_global)}", True, BLACK), (stats_x, stats_y + 30))
-    screen.blit(font.render(f"Destroyed: {len(destroyed_gases_global)}", True, BLACK), (stats_x, stats_y + 50))
+    stats_rect = pygame.Rect(stats_x, stats_y, RIGHT_PANEL_WIDTH - 40, 95)
 
     # Show current direction
     direction_names = {0: "Right →", 90: "Down ↓", 180: "Left ←", 270: "Up ↑"}
     current_dir = direction_names.get(rover_direction, f"Unknown ({rover_direction}°)")
-    screen.blit(font.render(f"Direction: {current_dir}", True, BLACK), (stats_x, stats_y + 70))
+    stats = (state.collected.bit_count(), state.destroyed.bit_count(), current_dir)
+    if region_changed("stats", stats):
+        scene.fill(WHITE, stats_rect)
+        scene.blit(render_text(big_font, "Status", BLACK), (stats_x, stats_y))
+        scene.blit(render_text(font, f"Collected: {stats[0]}", BLACK), (stats_x, stats_y + 30))
+        scene.blit(render_text(font, f"Destroyed: {stats[1]}", BLACK), (stats_x, stats_y + 50))
+        scene.blit(render_text(font, f"Direction: {current_dir}", BLACK), (stats_x, stats_y + 70))
+        dirty.append(stats_rect)
 
     # Console
-    console_rect = pygame.Rect(20, GRID_SIZE * TILE_SIZE + 70, WIDTH - 40, 110)
-    pygame.draw.rect(screen, LIGHTGRAY, console_rect)
-    pygame.draw.rect(screen, BLACK, console_rect, 2)
-
-    screen.blit(font.render("Console:", True, BLACK), (console_rect.x + 10, console_rect.y + 5))
+    console_rect = pygame.Rect(20, GRID_PX + 70, WIDTH - 40, 110)
     visible_height = console_rect.height - 40
     line_height = 20
     max_visible_lines = visible_height // line_height
@@ -248,372 +506,292 @@ def draw_grid(grid, rover, code_lines, current_input, message, visited,
     max_scroll = max(0, len(code_lines) - max_visible_lines)
     scroll_offset = max(0, min(scroll_offset, max_scroll))
 
-    # Render lines inside console
     start_idx = scroll_offset
     end_idx = start_idx + max_visible_lines
-    for i, line in enumerate(code_lines[start_idx:end_idx]):
-        screen.blit(font.render(line, True, BLACK),
-                    (console_rect.x + 10, console_rect.y + 25 + i * line_height))
-
-    # Input line pinned at bottom
-    screen.blit(font.render("> " + current_input, True, BLACK),
-                (console_rect.x + 10, console_rect.bottom - 25))
-
-    # Scrollbar indicator
-    if len(code_lines) > max_visible_lines:
-        bar_height = max(15, (visible_height / (len(code_lines) * line_height)) * visible_height)
-        bar_y = console_rect.y + 25 + (scroll_offset / max_scroll) * (visible_height - bar_height)
-        pygame.draw.rect(screen, BLACK, (console_rect.right - 6, bar_y, 4, bar_height))
+    shown = tuple(code_lines[start_idx:end_idx])
+    if region_changed("console", (shown, prompt, current_input, scroll_offset, len(code_lines))):
+        pygame.draw.rect(scene, LIGHTGRAY, console_rect)
+        pygame.draw.rect(scene, BLACK, console_rect, 2)
+        scene.blit(render_text(font, "Console:", BLACK), (console_rect.x + 10, console_rect.y + 5))
+
+        # Render lines inside console
+        for i, line in enumerate(shown):
+            scene.blit(render_text(font, line, BLACK),
+                       (console_rect.x + 10, console_rect.y + 25 + i * line_height))
+
+        # Input line pinned at bottom
+        scene.blit(render_text(font, prompt + current_input, BLACK),
+                   (console_rect.x + 10, console_rect.bottom - 25))
+
+        # Scrollbar indicator
+        if len(code_lines) > max_visible_lines:
+            bar_height = max(15, (visible_height / (len(code_lines) * line_height)) * visible_height)
+            bar_y = console_rect.y + 25 + (scroll_offset / max_scroll) * (visible_height - bar_height)
+            pygame.draw.rect(scene, BLACK, (console_rect.right - 6, bar_y, 4, bar_height))
+        dirty.append(console_rect)
 
     # Message box above buttons
     msg_rect = pygame.Rect(20, console_rect.bottom + 5, WIDTH - 40, 35)
-    pygame.draw.rect(screen, WHITE, msg_rect)
-    pygame.draw.rect(screen, BLACK, msg_rect, 1)
-    if message:
-        msg_txt = big_font.render(message, True, BLACK)
-        screen.blit(msg_txt, (msg_rect.x + 10, msg_rect.y + 5))
-
-    # Buttons at bottom: Step, Run/Pause, Reset, Exit
+    if region_changed("message", message):
+        pygame.draw.rect(scene, WHITE, msg_rect)
+        pygame.draw.rect(scene, BLACK, msg_rect, 1)
+        if message:
+            scene.set_clip(msg_rect)
+            msg_txt = render_text(big_font, message, BLACK)
+            scene.blit(msg_txt, (msg_rect.x + 10, msg_rect.y + 5))
+            scene.set_clip(None)
+        dirty.append(msg_rect)
+
+    # Buttons at bottom: Step, Run/Pause, speed, To End, Reset, Exit
     btn_y = HEIGHT - 55
     btn_w = 80
-    spacing = (WIDTH - (btn_w * 4)) // 5
-    step_btn = draw_button("Step", spacing, btn_y, btn_w, 40)
-    run_btn = draw_button("Run", spacing * 2 + btn_w, btn_y, btn_w, 40)
-    reset_btn = draw_button("Reset", spacing * 3 + btn_w * 2, btn_y, btn_w, 40)
-    exit_btn = draw_button("Exit", spacing * 4 + btn_w * 3, btn_y, btn_w, 40)
+    labels = ("Step", "Run", speed_label, "To End", "Reset", "Exit")
+    spacing = (WIDTH - (btn_w * len(labels))) // (len(labels) + 1)
+    redraw = region_changed("buttons", labels)
+    buttons = []
+    for n, label in enumerate(labels):
+        x = spacing * (n + 1) + btn_w * n
+        if redraw:
+            buttons.append(draw_button(label, x, btn_y, btn_w, 40, scene))
+            dirty.append(buttons[-1])
+        else:
+            buttons.append(pygame.Rect(x, btn_y, btn_w, 40))
 
     # Tooltip for hovered tile
     mx, my = pygame.mouse.get_pos()
     tooltip = None
-    if grid_x <= mx <= grid_x + GRID_SIZE * TILE_SIZE and grid_y <= my <= GRID_SIZE * TILE_SIZE:
-        tx = (mx - grid_x) // TILE_SIZE
-        ty = (my - grid_y) // TILE_SIZE
-        if 0 <= tx < GRID_SIZE and 0 <= ty < GRID_SIZE:
-            t = grid[ty][tx]
-            desc = "Empty"
-            if t == 'S': desc = "Start"
-            elif t == 'E': desc = "Goal"
-            elif t == 'X': desc = "Blocked"
-            elif t == 'G':
-                if (tx, ty) in destroyed_gases_global:
-                    desc = "Toxic gas (DESTROYED)"
-                else:
-                    desc = "Toxic gas (use destroy;)"
-            elif t == 'I':
-                if (tx, ty) in collected_items_global:
-                    desc = "Item (COLLECTED)"
-                else:
-                    desc = "Item (use collect;)"
-            tooltip = f"({tx},{ty}): {desc}"
+    hovered = screen_to_tile(mx, my, size)
+    if hovered:
+        tx, ty = hovered
+        t = grid[ty][tx]
+        desc = "Empty"
+        if t == 'S': desc = "Start"
+        elif t == 'E': desc = "Goal"
+        elif t == 'X': desc = "Blocked"
+        elif t == 'G':
+            if state.is_destroyed((tx, ty)):
+                desc = "Toxic gas (DESTROYED)"
+            else:
+                desc = "Toxic gas (use destroy;)"
+        elif t == 'I':
+            if state.is_collected((tx, ty)):
+                desc = "Item (COLLECTED)"
+            else:
+                desc = "Item (use collect;)"
+        tooltip = f"({tx},{ty}): {desc}"
 
+    tooltip_rect = None
     if tooltip:
-        tw = font.size(tooltip)[0] + 8
+        tw = render_text(font, tooltip, BLACK).get_width() + 8
         th = 24
-        pygame.draw.rect(screen, LIGHTGRAY, (mx+12, my+12, tw, th))
-        pygame.draw.rect(screen, BLACK, (mx+12, my+12, tw, th), 1)
-        screen.blit(font.render(tooltip, True, BLACK), (mx+16, my+16))
-
-    pygame.display.flip()
-    return step_btn, run_btn, reset_btn, exit_btn, intro_scroll, instr_scroll, scroll_offset
-
-# === Rover helpers ===
-def move(pos, direction, steps):
-    x, y = pos
-    if direction == 0: x += steps
-    elif direction == 90: y += steps
-    elif direction == 180: x -= steps
-    elif direction == 270: y -= steps
-    return (x, y)
-
-def parse_code(lines):
-    """Parse code lines into a flat list of instructions. Supports repeat(k){ ... } blocks."""
-    src = "\n".join(lines)
-    i = 0
-    n = len(src)
-
-    def read_while(cond):
-        nonlocal i
-        s = ""
-        while i < n and cond(src[i]):
-            s += src[i]
-            i += 1
-        return s
-
-    def skip_ws():
-        nonlocal i
-        while i < n and src[i].isspace(): i += 1
-
-    def parse_block():
-        nonlocal i
-        skip_ws()
-        if i < n and src[i:i+6].lower().startswith("repeat"):
-            i += 6
-            skip_ws()
-            if i >= n or src[i] != '(':
-                raise ValueError("Expected ( after repeat")
-            i += 1
-            num = read_while(lambda c: c.isdigit())
-            if not num:
-                raise ValueError("repeat(count) requires a number")
-            k = int(num)
-            skip_ws()
-            if i >= n or src[i] != ')':
-                raise ValueError("Expected ) after repeat(count)")
-            i += 1
-            skip_ws()
-            if i >= n or src[i] != '{':
-                raise ValueError("Expected { after repeat(count)")
-            i += 1
-            # capture block content
-            start = i
-            depth = 1
-            while i < n and depth > 0:
-                if src[i] == '{': depth += 1
-                elif src[i] == '}': depth -= 1
-                i += 1
-            block = src[start:i-1].strip()
-            inner_lines = [l.strip() for l in block.split(';') if l.strip()]
-            expanded = []
-            for _ in range(k):
-                for il in inner_lines:
-                    expanded.append(il + (';' if not il.endswith(';') and not il.endswith('.') else ''))
-            return expanded
-        else:
-            stmt = read_while(lambda c: c != ';' and c != '\n')
-            if i < n and src[i] == ';':
-                i += 1
-                stmt = stmt.strip() + ';'
-            else:
-                stmt = stmt.strip()
-            return [stmt]
-
-    parsed = []
-    while i < n:
-        skip_ws()
-        if i >= n: break
-        parsed.extend(parse_block())
-    parsed = [p for p in parsed if p]
-    return parsed
-
-def step_execution(grid, pos, direction):
-    """Perform a single micro-step using the live action_queue (REPL).
-       Returns (pos, direction, status, finished_bool_for_step_batch)"""
-    global current_move_remaining, action_queue, collected_items_global, destroyed_gases_global
-
-    # Continue an in-progress move
-    if current_move_remaining > 0:
-        if not action_queue:
-            current_move_remaining = 0
-            return pos, direction, "Move canceled (queue cleared).", True
-
-        instr = action_queue[0].strip().lower()
-        if instr.startswith("move("):
-            newpos = move(pos, direction, 1)
-
-            # bounds check
-            if newpos[0] < 0 or newpos[1] < 0 or newpos[0] >= GRID_SIZE or newpos[1] >= GRID_SIZE:
-                current_move_remaining = 0
-                action_queue.popleft()
-                return pos, direction, "Out of bounds!", True
-
-            tile = grid[newpos[1]][newpos[0]]
-            if tile == 'X':
-                current_move_remaining = 0
-                action_queue.popleft()
-                return pos, direction, "Hit blocked tile!", True
-
-            if tile == 'G' and newpos not in destroyed_gases_global:
-                current_move_remaining = 0
-                action_queue.popleft()
-                return pos, direction, "Toxic gas ahead — use destroy; then move(1);", True
-
-            pos = newpos
-            current_move_remaining -= 1
-
-            if current_move_remaining == 0:
-                action_queue.popleft()
-            return pos, direction, f"Moved 1 step. {current_move_remaining} remaining", False
-
-        else:
-            current_move_remaining = 0  # safety
-
-    # If nothing queued, we're done for now
-    if not action_queue:
-        return pos, direction, "No commands queued.", True
-
-    instr = action_queue[0].strip().lower()
-
-    # Start of a move(...)
-    if instr.startswith("move("):
-        try:
-            steps = int(instr[instr.find('(')+1:instr.find(')')])
-        except:
-            action_queue.popleft()
-            return pos, direction, "Invalid move argument", True
-
-        if steps <= 0:
-            action_queue.popleft()
-            return pos, direction, "Zero move ignored", False
-
-        current_move_remaining = steps
-        return pos, direction, f"Starting move of {steps} steps", False
-
-    # Turn(...)
-    if instr.startswith("turn("):
-        try:
-            angle = int(instr[instr.find('(')+1:instr.find(')')])
-        except:
-            action_queue.popleft()
-            return pos, direction, "Invalid turn argument", True
-
-        direction = (direction + angle) % 360
-        action_queue.popleft()
-        return pos, direction, f"Turned {angle}°", False
-
-    # collect;
-    if instr in ("collect;", "collect"):
-        if grid[pos[1]][pos[0]] == 'I':
-            collected_items_global.add(pos)
-            action_queue.popleft()
-            return pos, direction, "Collected item", False
+        tooltip_rect = pygame.Rect(mx+12, my+12, tw, th)
+    if region_changed("tooltip", (tooltip, tooltip_rect and tooltip_rect.topleft)):
+        if last_tooltip_rect:
+            dirty.append(last_tooltip_rect)
+        if tooltip_rect:
+            dirty.append(tooltip_rect)
+    last_tooltip_rect = tooltip_rect
+
+    # Performance overlay, drawn over the scene like the tooltip
+    hud_rect = None
+    if show_hud and hud_lines:
+        hud_rect = pygame.Rect(4, 2, HUD_WIDTH, len(hud_lines) * 15 + 4)
+    if region_changed("hud", hud_lines if hud_rect else None):
+        if last_hud_rect:
+            dirty.append(last_hud_rect)
+        if hud_rect:
+            dirty.append(hud_rect)
+    elif hud_rect and hud_rect.collidelist(dirty) >= 0:
+        dirty.append(hud_rect)
+    last_hud_rect = hud_rect
+    profiler.lap("panels")
+
+    if full or dirty:
+        if full:
+            screen.blit(scene, (0, 0))
         else:
-            action_queue.popleft()
-            return pos, direction, "Nothing to collect here!", True
-
-    # destroy; — destroys gas on the tile AHEAD (preferred), or on current tile
-    if instr in ("destroy;", "destroy"):
-        ahead = move(pos, direction, 1)  # tile in front
-        ax, ay = ahead
-        destroyed = False
-        where = None
-
-        # Try to destroy ahead
-        if 0 <= ax < GRID_SIZE and 0 <= ay < GRID_SIZE:
-            if grid[ay][ax] == 'G':
-                destroyed_gases_global.add((ax, ay))
-                destroyed = True
-                where = (ax, ay)
-
-        # Fallback: current tile
-        if not destroyed and grid[pos[1]][pos[0]] == 'G':
-            destroyed_gases_global.add(pos)
-            destroyed = True
-            where = pos
-
-        action_queue.popleft()
-        if destroyed:
-            return pos, direction, f"Destroyed gas at {where}", False
+            for rect in dirty:
+                screen.blit(scene, rect, rect)
+        if tooltip_rect:
+            pygame.draw.rect(screen, LIGHTGRAY, tooltip_rect)
+            pygame.draw.rect(screen, BLACK, tooltip_rect, 1)
+            screen.blit(render_text(font, tooltip, BLACK), (mx+16, my+16))
+            dirty.append(tooltip_rect)
+        if hud_rect:
+            pygame.draw.rect(screen, LIGHTGRAY, hud_rect)
+            pygame.draw.rect(screen, BLACK, hud_rect, 1)
+            for i, line in enumerate(hud_lines):
+                # not render_text: the numbers change constantly and would flush its cache
+                screen.blit(hud_font.render(line, True, BLACK), (hud_rect.x + 4, hud_rect.y + 2 + i * 15))
+        if full:
+            pygame.display.flip()
         else:
-            return pos, direction, "No gas ahead or underfoot to destroy.", True
-
-    # end.
-    if instr in ("end.", "end"):
-        action_queue.clear()
-        current_move_remaining = 0
-        return pos, direction, "Program ended", True
-
-    # Unknown -> skip
-    action_queue.popleft()
-    return pos, direction, f"Unknown instr '{instr}' skipped", False
-
-# (Optional run tester — not used by REPL)
-def run_code(grid, start, end, code):
-    pos = start
-    direction = 0
-    visited = [pos]
-    collected_items = set()
-    destroyed_gases = set()
-    move_count = 0
-
-    for line in code:
-        line = line.strip().lower()
-
-        if line.startswith("move("):
-            steps = int(line[line.find("(")+1:line.find(")")])
-            for _ in range(steps):
-                pos = move(pos, direction, 1)
-                move_count += 1
-                if pos[0] < 0 or pos[1] < 0 or pos[0] >= GRID_SIZE or pos[1] >= GRID_SIZE:
-                    return False, visited, "Out of bounds!"
-                tile = grid[pos[1]][pos[0]]
-                if tile == "X":
-                    return False, visited, "Blocked tile!"
-                if tile == "G" and pos not in destroyed_gases:
-                    return False, visited, "Toxic gas not destroyed!"
-                if tile == "I" and pos not in collected_items:
-                    return False, visited, "Item not collected!"
-                visited.append(pos)
-
-        elif line.startswith("turn("):
-            angle = int(line[line.find("(")+1:line.find(")")])
-            direction = (direction + angle) % 360
-
-        elif line == "collect;":
-            if grid[pos[1]][pos[0]] == "I":
-                collected_items.add(pos)
-            else:
-                return False, visited, "Nothing to collect!"
-
-        elif line == "destroy;":
-            if grid[pos[1]][pos[0]] == "G":
-                destroyed_gases.add(pos)
-            else:
-                return False, visited, "Nothing to destroy!"
-
-        elif line == "end.":
-            break
-
-    if pos == end:
-        return True, visited, f"Good job! Mission complete in {move_count} moves!"
-    return False, visited, "Rover did not reach the goal!"
+            pygame.display.update(dirty)
+    profiler.lap("flip")
+    return (*buttons, intro_scroll, instr_scroll, scroll_offset)
+
+# === CLIPBOARD ===
+def clipboard_text():
+    """Text on the system clipboard with Unix line endings, or "" when there is none."""
+    try:
+        if not pygame.scrap.get_init():
+            pygame.scrap.init()
+        text = pygame.scrap.get_text()
+    except (pygame.error, AttributeError):
+        return ""
+    return (text or "").replace("\r\n", "\n").replace("\r", "\n")
 
 # === MAIN ===
-current_input, code_lines, message, visited = "", [], "", []
+current_input, code_lines, message = "", [], ""
 intro_scroll, instr_scroll = 0, 0
 scroll_offset = 0
 
 # Execution runtime state
 is_running = False
 is_paused = False
-run_delay_ms = 300   # delay between micro-steps when running
-last_run_time = 0
-rover_direction = 0  # 0 = right, 90 = down, 180 = left, 270 = up
+finishing = False    # "To End" pressed: simulating without drawing until done
+FINISH_SLICE_TICKS = 250_000   # micro-steps run_to_end runs per frame while finishing (~0.2 s)
+scheduler = Scheduler()
+drag_origin = None   # mouse position of an in-progress right-button pan
+IDLE_WAIT_MS = 1000  # longest sleep between frames while no program is running
+
+PAN_KEYS = {pygame.K_LEFT: (-1, 0), pygame.K_RIGHT: (1, 0), pygame.K_UP: (0, -1), pygame.K_DOWN: (0, 1)}
+
+def new_map():
+    """A fresh map of MAP_SIZE tiles; big maps use chunked storage."""
+    if MAP_SIZE >= CHUNKED_MIN_SIZE:
+        return generate_chunked_grid(MAP_SIZE, MAP_SEED)
+    return generate_grid(MAP_SEED, MAP_SIZE)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rover Pathway - Hard Mode (REPL)")
+    parser.add_argument("--size", type=int, default=GRID_SIZE, help="map size in tiles per side")
+    parser.add_argument("--seed", type=int, default=None, help="always play the map with this seed")
+    parser.add_argument("--perf-csv", metavar="PATH", help="write per-frame timings to a CSV file")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long the import and the first frame took")
+    return parser.parse_args(argv)
 
 def main():
-    global current_input, code_lines, message, visited, intro_scroll, instr_scroll, scroll_offset
-    grid, start, end = generate_grid()
-    rover = start
-    visited = [rover]
-
-    global is_running, is_paused, last_run_time, rover_direction, status_message
+    global current_input, code_lines, message, intro_scroll, instr_scroll, scroll_offset
+    global MAP_SIZE, MAP_SEED, follow_rover, drag_origin, show_hud, hud_lines
+    args = parse_args()
+    MAP_SIZE, MAP_SEED = args.size, args.seed
+    if args.perf_csv:
+        dump = CsvDump(args.perf_csv)
+        profiler.add_hook(dump)
+        atexit.register(dump.close)
+    hud_updated = 0
+    finish_moves = 0     # tiles moved by the current To End run
+    grid, start, end = new_map()
+    state = RoverState.for_grid(grid, start)
+    recorder = TraceRecorder(grid, start)
+    stepper = micro_steps(grid, state, end)
+    line_parser = LineParser()
+
+    global is_running, is_paused, finishing, status_message
+
+    def sim_step():
+        """One micro-step of the queued program; False when nothing is left to run."""
+        global status_message, is_running
+        if not state.pending():
+            status_message = "No commands queued."
+            return False
+        status, _ = recorder.step(grid, state, stepper)
+        profiler.count("steps")
+        status_message = status
+        if state.pos == end:
+            status_message = "Mission complete! All objectives achieved!"
+            is_running = False
+            return False
+        return True
+
+    def submit(lines):
+        """Log console lines and queue the statements they complete, in one parse."""
+        global scroll_offset, status_message
+        code_lines.extend(line.strip() for line in lines if line.strip())
+        try:
+            program = line_parser.feed("\n".join(lines))
+        except ValueError as e:
+            status_message = f"Parse error: {e}"
+        else:
+            if program:
+                if is_running and not state.pending():
+                    # the run sat idle; don't let the old clock release a burst of steps
+                    scheduler.restart(pygame.time.get_ticks())
+                state.queue(program)
+                status_message = "Queued." if len(lines) == 1 else f"Queued {len(program)} instructions."
+            elif line_parser.is_open():
+                status_message = "Block open - finish it with }"
+        # Auto-scroll to bottom of console
+        visible_height = 110 - 40
+        line_height = 20
+        max_visible_lines = visible_height // line_height
+        scroll_offset = max(0, len(code_lines) - max_visible_lines)
+
+    needs_draw = True
+    first_frame = True
     while True:
-        step_btn, run_btn, reset_btn, exit_btn, intro_scroll, instr_scroll, scroll_offset = draw_grid(
-            grid, rover, code_lines, current_input, status_message or message, visited, intro_scroll, instr_scroll, scroll_offset, rover_direction
-        )
-
+        profiler.begin_frame()
+        if needs_draw and not finishing:
+            (step_btn, run_btn, speed_btn, end_btn, reset_btn, exit_btn,
+             intro_scroll, instr_scroll, scroll_offset) = draw_grid(
+                grid, state, code_lines, current_input, status_message or message,
+                intro_scroll, instr_scroll, scroll_offset, scheduler.label,
+                "... " if line_parser.is_open() else "> "
+            )
+        if first_frame:
+            first_frame = False
+            startup_times["first frame"] = time.perf_counter() - IMPORT_STARTED
+            cold = startup_cache_dirty
+            save_startup_cache()
+            if args.startup_report:
+                print(format_startup_report(cold), file=sys.stderr)
+
+        # Idle: sleep until input arrives instead of redrawing at 60 FPS.
+        # A run whose queue has drained is idle too until more code is queued.
+        active = finishing or (is_running and not is_paused and state.pending())
+        if active:
+            events = pygame.event.get()
+        else:
+            event = pygame.event.wait(HUD_REFRESH_MS if show_hud else IDLE_WAIT_MS)
+            events = [] if event.type == pygame.NOEVENT else [event] + pygame.event.get()
+            profiler.lap("idle")
         now = pygame.time.get_ticks()
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit(); sys.exit()
 
+            elif event.type == pygame.VIDEOEXPOSE:
+                invalidate_frame()
+
             elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_RETURN:
-                    line = current_input.strip()
-                    if line:
-                        code_lines.append(line)
-                        try:
-                            new_actions = parse_code([line])
-                            for a in new_actions:
-                                action_queue.append(a)
-                            status_message = "Queued."
-                        except Exception as e:
-                            status_message = f"Parse error: {e}"
-                        # Auto-scroll to bottom of console
-                        visible_height = 110 - 40
-                        line_height = 20
-                        max_visible_lines = visible_height // line_height
-                        scroll_offset = max(0, len(code_lines) - max_visible_lines)
+                if event.mod & pygame.KMOD_CTRL and event.key in PAN_KEYS:
+                    dx, dy = PAN_KEYS[event.key]
+                    step = max(1, view_tiles() // 4)
+                    pan_camera(dx * step, dy * step, len(grid))
+                elif event.key == pygame.K_F2:
+                    follow_rover = not follow_rover
+                    if follow_rover:
+                        center_camera(state.pos, len(grid))
+                elif event.key == pygame.K_F4:
+                    show_hud = not show_hud
+                    hud_lines = format_hud(profiler.summary())
+                elif event.key == pygame.K_F3:
+                    path = time.strftime("trace-%Y%m%d-%H%M%S.rvt")
+                    recorder.save(path)
+                    status_message = f"Trace of {recorder.steps} steps saved to {path}"
+                elif event.key == pygame.K_v and event.mod & pygame.KMOD_CTRL:
+                    pasted = clipboard_text()
+                    if pasted:
+                        lines = (current_input + pasted).split("\n")
+                        current_input = lines.pop()
+                        if lines:
+                            submit(lines)
+                elif event.key == pygame.K_RETURN:
+                    if current_input.strip():
+                        submit([current_input])
                     current_input = ""
                 elif event.key == pygame.K_BACKSPACE:
                     current_input = current_input[:-1]
@@ -627,15 +805,22 @@ def main():
                 else:
                     current_input += event.unicode
 
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+                drag_origin = event.pos
+
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+                drag_origin = None
+
+            elif event.type == pygame.MOUSEMOTION and drag_origin:
+                dx = (drag_origin[0] - event.pos[0]) // tile_px
+                dy = (drag_origin[1] - event.pos[1]) // tile_px
+                if dx or dy:
+                    pan_camera(dx, dy, len(grid))
+                    drag_origin = (drag_origin[0] - dx * tile_px, drag_origin[1] - dy * tile_px)
+
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if step_btn.collidepoint(event.pos):
-                    rover, rover_direction, status, _ = step_execution(grid, rover, rover_direction)
-                    status_message = status
-                    if rover not in visited:
-                        visited.append(rover)
-                    if rover == end:
-                        status_message = "Mission complete! All objectives achieved!"
-                        is_running = False
+                    sim_step()
 
                 elif run_btn.collidepoint(event.pos):
                     if is_running:
@@ -645,23 +830,29 @@ def main():
                     else:
                         is_running = True
                         is_paused = False
-                        last_run_time = now
+                        scheduler.restart(now)
                         status_message = "Running..."
 
+                elif speed_btn.collidepoint(event.pos):
+                    scheduler.cycle()
+                    scheduler.restart(now)
+
+                elif end_btn.collidepoint(event.pos):
+                    finishing = True
+                    finish_moves = 0
+                    status_message = "Running to end..."
+
                 elif reset_btn.collidepoint(event.pos):
-                    grid, start, end = generate_grid()
-                    rover = start
-                    rover_direction = 0
-                    visited = [rover]
+                    grid, start, end = new_map()
+                    state = RoverState.for_grid(grid, start)
+                    recorder = TraceRecorder(grid, start)
+                    stepper = micro_steps(grid, state, end)
+                    line_parser.reset()
                     code_lines, current_input, message = [], "", ""
-                    action_queue.clear()
-                    global current_move_remaining
-                    current_move_remaining = 0
-                    collected_items_global.clear()
-                    destroyed_gases_global.clear()
                     status_message = ""
                     is_running = False
                     is_paused = False
+                    finishing = False
                     scroll_offset = 0
 
                 elif exit_btn.collidepoint(event.pos):
@@ -669,7 +860,10 @@ def main():
 
             elif event.type == pygame.MOUSEWHEEL:
                 mx, my = pygame.mouse.get_pos()
-                if GRID_SIZE*TILE_SIZE+40 <= mx <= WIDTH-20:
+                hovered = screen_to_tile(mx, my, len(grid))
+                if hovered:
+                    zoom_camera(event.y, len(grid), hovered)
+                elif GRID_PX+40 <= mx <= WIDTH-20:
                     if 50 <= my <= 210:  # Intro panel
                         intro_scroll += event.y * 10
                     elif 220 <= my <= 420:  # Instructions panel
@@ -682,18 +876,37 @@ def main():
                     scroll_offset -= event.y
                     scroll_offset = max(0, min(max(0, len(code_lines) - max_visible_lines), scroll_offset))
 
-        # Run mode: advance micro-step every run_delay_ms
-        if is_running and not is_paused and now - last_run_time >= run_delay_ms:
-            last_run_time = now
-            rover, rover_direction, status, _ = step_execution(grid, rover, rover_direction)
-            if rover not in visited:
-                visited.append(rover)
-            status_message = status
-            if rover == end:
-                status_message = "Mission complete! All objectives achieved!"
-                is_running = False
+        profiler.lap("events")
 
-        clock.tick(60)
+        # Simulation runs on the scheduler's clock, not once per frame
+        if finishing:
+            # The run-to-completion core in frame-sized slices; the trace gets one
+            # OP_RUN record per slice instead of one per micro-step
+            outcome, moved = recorder.run_to_end(grid, state, end, FINISH_SLICE_TICKS)
+            finish_moves += moved
+            if outcome != TICK_LIMIT:
+                finishing = False
+                is_running = False
+                if outcome == SUCCESS:
+                    status_message = "Mission complete! All objectives achieved!"
+                else:
+                    status_message = f"Ran to the end ({finish_moves} moves): {OUTCOME_MESSAGES[outcome]}"
+        elif is_running and not is_paused:
+            scheduler.advance(sim_step, now)
+        profiler.lap("simulation")
+        profiler.gauge("queue", len(state.program) - state.pc)
+
+        if active:
+            clock.tick(60)
+            profiler.lap("idle")
+        profiler.end_frame()
+        needs_draw = active or bool(events)
+        if show_hud and now - hud_updated >= HUD_REFRESH_MS:
+            hud_lines = format_hud(profiler.summary())
+            hud_updated = now
+            needs_draw = True
+
+startup_times["import"] = time.perf_counter() - IMPORT_STARTED
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,59 @@
+"""compile_source's regex fast path must compile exactly what parse() does."""
+import random
+
+import pytest
+
+from compiler import MAX_ARG, _compile_fast, _compile_parsed, _Fallback, compile_source
+
+# Valid and broken pieces: terminators, end., repeat headers, overflow, stray tokens
+FRAGMENTS = (
+    "move(1)", "MOVE (3)", "turn(90)", "turn( -90 )", "move(-2)", "collect", "Destroy",
+    "end", "end.", "end .", "repeat(2){", "repeat(0){", "repeat (3)\n{", "repeat(-1){",
+    "}", "{", ";", "\n", " ", "\t", "\r", "move", "movex(1)", "move(1-2)",
+    f"move({MAX_ARG + 1})", f"repeat({MAX_ARG + 1}){{", "x", "(", ")", ".", "1",
+    "move(1)x", "collect;", "é", "repeat(2)", "\n\n",
+)
+SEPARATORS = ("", ";", "\n", " ", "; ")
+
+
+def _outcome(compile_fn, src):
+    try:
+        return "ok", list(compile_fn(src))
+    except ValueError as e:
+        return "error", str(e)
+
+
+def test_fast_path_matches_parse_on_random_snippets():
+    rng = random.Random(20240917)
+    fast = 0
+    for _ in range(20000):
+        src = "".join(rng.choice(FRAGMENTS) + rng.choice(SEPARATORS)
+                      for _ in range(rng.randint(0, 12)))
+        assert _outcome(compile_source, src) == _outcome(_compile_parsed, src), repr(src)
+        try:
+            _compile_fast(src)
+            fast += 1
+        except _Fallback:
+            pass
+    assert fast > 1000   # the fast path is really exercised, not just the fallback
+
+
+@pytest.mark.parametrize("src", [
+    "move(3); turn(90);\ncollect; destroy",
+    "repeat(3)\n\n{ move(1); repeat(2){ turn(90); } }",
+    "repeat(0){ move(5); } move(1)",
+    "end.move(1)",
+    "end .\nrepeat(2){collect}",
+    f"move({MAX_ARG}); repeat({MAX_ARG}){{ turn(-{MAX_ARG}) }}",
+])
+def test_well_formed_programs_take_the_fast_path(src):
+    assert list(_compile_fast(src)) == list(_compile_parsed(src))
+
+
+@pytest.mark.parametrize("src", [
+    "move(1) turn(90)", "repeat(2);{ move(1) }", "move(1-2)", "}", "repeat(2){ move(1)",
+    f"move({MAX_ARG + 1})", f"repeat({MAX_ARG + 1}){{ move(1) }}",
+])
+def test_errors_match_parse(src):
+    assert _outcome(compile_source, src) == _outcome(_compile_parsed, src)
+    assert _outcome(compile_source, src)[0] == "error"
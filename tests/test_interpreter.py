@@ -0,0 +1,110 @@
+"""Every way of running a program ends the same way: same outcome, same moves.
+
+run_to_end is checked against single micro-steps through micro_steps,
+against the NumPy batch simulator with no scalar tail and against
+optimize()d programs, on seeded random programs and maps.
+"""
+import random
+
+import pytest
+
+import batch
+from compiler import compile_source, optimize
+from engine import (
+    BLOCKED, EV_MOVED, GAS_NOT_DESTROYED, NOT_AT_GOAL, NOTHING_TO_COLLECT, NOTHING_TO_DESTROY,
+    OUT_OF_BOUNDS, STEP_MESSAGES, SUCCESS, TICK_LIMIT, RoverState, generate_grid,
+    micro_steps, run_to_end,
+)
+from solver import solve
+
+SIZES = (6, 14, 40)
+LIMITS = (None, 5, 30, 200)
+# move(20) and move(40) are long enough for the RunIndex shortcut
+COMMANDS = ("move(1);", "move(3);", "move(0);", "move(20);", "move(40);", "move(-2);",
+            "turn(90);", "turn(270);", "turn(45);", "collect;", "destroy;")
+FAULTS = {STEP_MESSAGES[code][0]: code for code in
+          (OUT_OF_BOUNDS, BLOCKED, GAS_NOT_DESTROYED, NOTHING_TO_COLLECT, NOTHING_TO_DESTROY)}
+MOVED = STEP_MESSAGES[EV_MOVED][0].split("{}")[0]
+ARRIVED = STEP_MESSAGES[SUCCESS][0]
+
+
+def _statements(rng, depth=0):
+    out = []
+    for _ in range(rng.randint(1, 8)):
+        if depth < 2 and rng.random() < 0.2:
+            out.append(f"repeat({rng.randint(0, 4)}){{ {' '.join(_statements(rng, depth + 1))} }}")
+        elif rng.random() < 0.03:
+            out.append("end.")
+        else:
+            out.append(rng.choice(COMMANDS))
+    return out
+
+
+def _cases(count=1500, seed=24):
+    rng = random.Random(seed)
+    cases = []
+    for i in range(count):
+        grid, start, end = generate_grid(seed * 100_000 + i, rng.choice(SIZES))
+        lines = _statements(rng)
+        # Random programs seldom reach E; route some through the solver's answer
+        solution = solve(grid, start, end) if len(grid) < 40 and i % 4 == 0 else None
+        if solution is not None:
+            lines = solution.program + lines[:rng.randint(0, 2)]
+        program = compile_source("\n".join(lines))
+        cases.append((grid, start, end, program, rng.choice(LIMITS)))
+    return cases
+
+
+CASES = _cases()
+
+
+def _run(grid, start, end, program, limit=None):
+    state = RoverState.for_grid(grid, start)
+    state.program = program
+    return run_to_end(grid, state, end, limit)
+
+
+def _stepped(grid, start, end, program, limit):
+    """Outcome and moves from one micro_steps step at a time."""
+    state = RoverState.for_grid(grid, start)
+    state.program = program
+    steps = micro_steps(grid, state, end)
+    fault = moves = ticks = 0
+    while state.pending():
+        if limit is not None and ticks >= limit:
+            return TICK_LIMIT, moves
+        status, _ = next(steps)
+        ticks += 1
+        # A step at 45° counts as a move even though the rover stays put
+        if status.startswith(MOVED) or status == ARRIVED:
+            moves += 1
+        if status == ARRIVED:
+            return SUCCESS, moves
+        fault = fault or FAULTS.get(status, 0)
+    return fault or NOT_AT_GOAL, moves
+
+
+def test_outcomes_cover_success_faults_and_tick_limits():
+    outcomes = {_run(*case)[0] for case in CASES}
+    assert {SUCCESS, NOT_AT_GOAL, TICK_LIMIT, BLOCKED, GAS_NOT_DESTROYED} <= outcomes
+
+
+def test_run_to_end_matches_micro_steps():
+    for i, case in enumerate(CASES):
+        assert _run(*case) == _stepped(*case), i
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("limit", LIMITS)
+def test_batch_matches_run_to_end(monkeypatch, size, limit):
+    monkeypatch.setattr(batch, "TAIL_LANES", 0)   # every lane in NumPy, none handed to run_to_end
+    group = [case for case in CASES if len(case[0]) == size and case[4] == limit]
+    result = batch.run_batch([c[3] for c in group], [c[0] for c in group],
+                             [c[1] for c in group], [c[2] for c in group], limit)
+    for case, status, moves in zip(group, result.status, result.move_count):
+        assert (int(status), int(moves)) == _run(*case)
+
+
+def test_optimize_keeps_outcome_and_moves():
+    for i, (grid, start, end, program, _) in enumerate(CASES):
+        assert _run(grid, start, end, optimize(program)) == _run(grid, start, end, program), i